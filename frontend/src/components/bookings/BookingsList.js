@@ -164,8 +164,8 @@ const BookingsList = () => {
   const handleDeleteOldVehicles = async () => {
     if (window.confirm('Are you sure you want to delete all vehicles with bookings older than 6 months?')) {
       try {
-        await bookingAPI.deleteOldVehicles();
-        alert('Old vehicles deleted successfully');
+        const response = await bookingAPI.deleteOldVehicles();
+        alert(`Old vehicle removal started (job #${response.data.job_id})`);
         fetchBookings(); // Refresh to update vehicle counts
       } catch (err) {
         console.error('Error deleting old vehicles:', err);
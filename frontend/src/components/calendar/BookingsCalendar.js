@@ -29,7 +29,7 @@ import {
   LocationOn
 } from '@mui/icons-material';
 import { styled } from '@mui/material/styles';
-import { bookingAPI, vehicleAPI } from '../../services/api';
+import { bookingAPI } from '../../services/api';
 import { Link } from 'react-router-dom';
 
 // Styled components
@@ -118,10 +118,6 @@ const BookingsCalendar = () => {
   const [modalOpen, setModalOpen] = useState(false);
   const [bookingWithVehicles, setBookingWithVehicles] = useState(null);
 
-  useEffect(() => {
-    fetchBookings();
-  }, []);
-
   // When a date is selected, filter bookings for that date
   useEffect(() => {
     if (selectedDate && events.length > 0) {
@@ -147,50 +143,35 @@ const BookingsCalendar = () => {
     }
   }, [selectedDate, events]);
 
-  const fetchBookings = async () => {
+  // Fetch only the events of the visible range; rows come back as compact arrays
+  const fetchEvents = async (start, end) => {
     try {
       setLoading(true);
-      // Adapt this API call based on your actual API structure
-      const response = await bookingAPI.getAll();
-      const bookings = response.data;
-      
-      const formattedEvents = [];
-      bookings.forEach(booking => {
-        // Add departure event
-        if (booking.ship_departure_date) {
-          formattedEvents.push({
-            id: `dep-${booking.id}`,
-            title: `${booking.booking_number} (Departure)`,
-            start: booking.ship_departure_date,
-            className: 'fc-event-departure',
-            extendedProps: { 
-              type: 'departure', 
-              bookingId: booking.id,
-              bookingNumber: booking.booking_number,
-              loadingPort: booking.loading_port,
-              dischargePort: booking.discharge_port
-            }
-          });
-        }
-        
-        // Add arrival event
-        if (booking.ship_arrival_date) {
-          formattedEvents.push({
-            id: `arr-${booking.id}`,
-            title: `${booking.booking_number} (Arrival)`,
-            start: booking.ship_arrival_date,
-            className: 'fc-event-arrival',
-            extendedProps: { 
-              type: 'arrival', 
-              bookingId: booking.id,
-              bookingNumber: booking.booking_number,
-              loadingPort: booking.loading_port,
-              dischargePort: booking.discharge_port
-            }
-          });
-        }
+      const response = await bookingAPI.getCalendar(start, end);
+      const { fields, events: rows } = response.data;
+      const column = Object.fromEntries(fields.map((field, index) => [field, index]));
+
+      const formattedEvents = rows.map(row => {
+        const type = row[column.type];
+        const bookingId = row[column.booking_id];
+        const bookingNumber = row[column.booking_number];
+        return {
+          id: `${type === 'departure' ? 'dep' : 'arr'}-${bookingId}`,
+          title: `${bookingNumber} (${type === 'departure' ? 'Departure' : 'Arrival'})`,
+          start: row[column.date],
+          className: `fc-event-${type}`,
+          extendedProps: {
+            type,
+            bookingId,
+            bookingNumber,
+            vehicleCount: row[column.vehicle_count],
+            ...(type === 'departure'
+              ? { loadingPort: row[column.port] }
+              : { dischargePort: row[column.port] })
+          }
+        };
       });
-      
+
       setEvents(formattedEvents);
     } catch (error) {
       console.error('Error fetching bookings:', error);
@@ -199,6 +180,10 @@ const BookingsCalendar = () => {
     }
   };
 
+  const handleDatesSet = (info) => {
+    fetchEvents(info.startStr, info.endStr);
+  };
+
   const handleDateClick = (info) => {
     setSelectedDate(info.date);
     setSelectedBooking(null);
@@ -215,19 +200,10 @@ const BookingsCalendar = () => {
 
   const fetchBookingDetails = async (bookingId) => {
     try {
-      // Get the booking details
+      // The booking detail response already embeds its vehicles
       const response = await bookingAPI.getBooking(bookingId);
-      const booking = response.data;
-      
-      // Get vehicles for this specific booking using the proper parameter
-      const vehiclesResponse = await vehicleAPI.getVehicles({ booking: bookingId });
-      const vehicles = vehiclesResponse.data;
-      
-      const bookingWithVehicles = {
-        ...booking,
-        vehicles: vehicles
-      };
-      
+      const bookingWithVehicles = response.data;
+
       setSelectedBooking(bookingWithVehicles);
       setBookingWithVehicles(bookingWithVehicles);
     } catch (error) {
@@ -275,6 +251,7 @@ const BookingsCalendar = () => {
                 right: 'dayGridMonth,timeGridWeek,listMonth'
               }}
               events={events}
+              datesSet={handleDatesSet}
               eventClick={handleEventClick}
               dateClick={handleDateClick}
               height="100%"
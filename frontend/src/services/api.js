@@ -7,11 +7,54 @@ const api = axios.create({
   headers: {
     'Content-Type': 'application/json',
   },
+  // 304 Not Modified is answered from the local copy below
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+});
+
+// Last response and its validators for every GET url, so refreshes can be
+// revalidated with If-None-Match / If-Modified-Since instead of refetched
+const responseCache = new Map();
+
+const cacheKey = (config) => api.getUri(config);
+
+api.interceptors.request.use((config) => {
+  if ((config.method || 'get').toLowerCase() === 'get' && config.responseType !== 'blob') {
+    const cached = responseCache.get(cacheKey(config));
+    if (cached) {
+      if (cached.etag) config.headers['If-None-Match'] = cached.etag;
+      if (cached.lastModified) config.headers['If-Modified-Since'] = cached.lastModified;
+    }
+  }
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  const { config } = response;
+  if ((config.method || 'get').toLowerCase() !== 'get' || config.responseType === 'blob') {
+    return response;
+  }
+
+  const key = cacheKey(config);
+  if (response.status === 304) {
+    const cached = responseCache.get(key);
+    if (cached) {
+      return { ...response, status: 200, data: cached.data };
+    }
+    return response;
+  }
+
+  const etag = response.headers.etag;
+  const lastModified = response.headers['last-modified'];
+  if (etag || lastModified) {
+    responseCache.set(key, { etag, lastModified, data: response.data });
+  }
+  return response;
 });
 
 export const bookingAPI = {
   getBookings: () => api.get('/bookings/', { params: { limit: 100 } }), // Increase limit
   getBooking: (id) => api.get(`/bookings/${id}/`),
+  getCalendar: (start, end) => api.get('/bookings/calendar/', { params: { start, end } }),
   createBooking: (data) => api.post('/bookings/', data),
   updateBooking: (id, data) => api.put(`/bookings/${id}/`, data),
   deleteBooking: (id) => api.delete(`/bookings/${id}/`),
@@ -36,10 +79,21 @@ export const vehicleAPI = {
     api.post('/vehicles/create_random_vehicle/', bookingId ? { booking: bookingId } : {}),
   addToBooking: (vehicleId, bookingId) =>
     api.post(`/vehicles/${vehicleId}/add_to_booking/`, { booking_id: bookingId }),
+  bulkAssign: (bookingId, { vehicleIds, vins, filter } = {}) =>
+    api.post('/vehicles/bulk_assign/', {
+      booking_id: bookingId,
+      vehicle_ids: vehicleIds,
+      vins,
+      filter,
+    }),
   exportVehiclesCSV: () =>
     api.get('/vehicles/export_csv/', { responseType: 'blob' }),
   exportVehiclesExcel: () =>
     api.get('/vehicles/export_excel/', { responseType: 'blob' }),
 };
 
+export const jobAPI = {
+  getJob: (id) => api.get(`/jobs/${id}/`),
+};
+
 export default api;
\ No newline at end of file
@@ -1,14 +1,130 @@
 # logistics/admin.py
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from import_export.admin import ImportExportModelAdmin
-from .models import Booking, Vehicle
+from .app_settings import ADMIN_EXACT_COUNT_LIMIT, ADMIN_INLINE_PER_PAGE
+from .models import Booking, Vehicle, Job
 from .resources import BookingResource, VehicleResource
+from .search import search_bookings, search_vehicles
+
+
+def estimate_row_count(model, using):
+    """
+    Return the planner's row count estimate for a model's table, or None.
+
+    That is pg_class.reltuples on PostgreSQL and the row count ANALYZE
+    stores in sqlite_stat1 on SQLite, so it is as current as the last
+    (auto)vacuum or ANALYZE. None means the table was never analyzed or the
+    database keeps no estimate; callers then count instead.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            # Every stat row of a table starts with the table's row count
+            estimate = int(row[0].split()[0]) if row else None
+        else:
+            return None
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Changelist paginator that never counts more than ADMIN_EXACT_COUNT_LIMIT rows.
+
+    Unfiltered lists of large tables use the database's row estimate,
+    filtered lists are counted up to the limit, which bounds the number of
+    pages that can be reached.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:ADMIN_EXACT_COUNT_LIMIT].count()
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset that only builds forms for one page of the related objects"""
+    per_page = ADMIN_INLINE_PER_PAGE
+    page_param = 'page'
+    page_number = None
+
+    @property
+    def page(self):
+        if not hasattr(self, '_page'):
+            self._page = Paginator(super().get_queryset(), self.per_page).get_page(self.page_number)
+            # Forms index into the page, so fetch its rows once
+            self._page.object_list = list(self._page.object_list)
+        return self._page
+
+    def get_queryset(self):
+        return self.page.object_list
+
+
+class BookingFilter(admin.SimpleListFilter):
+    """
+    Filter vehicles by booking without listing every booking in the sidebar.
+
+    Offers assigned and not assigned; a single booking is selected with
+    ?booking=<id>, as linked from the booking changelist.
+    """
+    title = 'booking'
+    parameter_name = 'booking'
+
+    def lookups(self, request, model_admin):
+        choices = [('assigned', 'Assigned'), ('none', 'Not assigned')]
+        value = self.value()
+        if value and value.isdigit():
+            booking = Booking.objects.filter(pk=value).only('booking_number').first()
+            if booking is not None:
+                choices.append((value, booking.booking_number))
+        return choices
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value == 'assigned':
+            return queryset.filter(booking__isnull=False)
+        if value == 'none':
+            return queryset.filter(booking__isnull=True)
+        if value and value.isdigit():
+            return queryset.filter(booking_id=value)
+        return queryset
 
 
 class VehicleInline(admin.TabularInline):
     model = Vehicle
+    formset = PaginatedInlineFormSet
     extra = 1
     fields = ('vin', 'make', 'model', 'weight')
+    show_change_link = True
+    template = 'admin/logistics/booking/vehicle_inline.html'
+    page_param = 'vehicles_page'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.page_param = self.page_param
+        formset.page_number = request.GET.get(self.page_param)
+        return formset
 
 
 @admin.register(Booking)
@@ -19,16 +135,46 @@ class BookingAdmin(ImportExportModelAdmin):
     search_fields = ('booking_number', 'loading_port', 'discharge_port')
     list_filter = ('loading_port', 'discharge_port')
     inlines = [VehicleInline]
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
     def get_vehicle_count(self, obj):
-        return obj.vehicles.count()
+        # Stored on the booking, so no per-row COUNT query
+        url = reverse('admin:logistics_vehicle_changelist')
+        return format_html('<a href="{}?booking={}">{}</a>', url, obj.pk, obj.vehicle_count)
 
     get_vehicle_count.short_description = 'Vehicles'
+    get_vehicle_count.admin_order_field = 'vehicle_count'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Booking number prefix or ranked port search instead of icontains scans
+        if not search_term:
+            return queryset, False
+        return search_bookings(queryset, search_term), False
 
 
 @admin.register(Vehicle)
 class VehicleAdmin(ImportExportModelAdmin):
     resource_class = VehicleResource
     list_display = ('vin', 'make', 'model', 'weight', 'booking')
+    list_select_related = ('booking',)
     search_fields = ('vin', 'make', 'model')
-    list_filter = ('make', 'booking')
\ No newline at end of file
+    # Makes are read from the make index; bookings are too many to list
+    list_filter = ('make', BookingFilter)
+    autocomplete_fields = ('booking',)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # VIN prefix or ranked make and model search instead of icontains scans
+        if not search_term:
+            return queryset, False
+        return search_vehicles(queryset, search_term), False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'rows_processed', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('kind', 'status', 'params', 'rows_processed', 'result', 'error',
+                       'created_at', 'started_at', 'finished_at')
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.conf import settings
 
 # Default settings
@@ -8,6 +11,38 @@ DEFAULTS = {
     'DEFAULT_VEHICLE_WEIGHT': 1500.00,
     'DEFAULT_VEHICLE_MAKE': 'Default Make',
     'DEFAULT_VEHICLE_MODEL': 'Default Model',
+    'EXPORT_CHUNK_SIZE': 2000,  # Rows fetched per database round trip when exporting
+    'IMPORT_BATCH_SIZE': 1000,  # Rows validated and inserted per batch when importing
+    'IMPORT_MAX_BATCH_SIZE': 10000,  # Upper bound for a client supplied batch_size
+    'BULK_ASSIGN_MAX_ITEMS': 10000,  # Max vehicle ids or VINs accepted per bulk assignment
+    'BOOKING_UPSERT_MAX_ITEMS': 5000,  # Max bookings accepted per bulk upsert
+    'VEHICLE_UPSERT_MAX_ITEMS': 5000,  # Max vehicles accepted per bulk upsert
+    'PURGE_BATCH_SIZE': 1000,  # Vehicles deleted per transaction when purging
+    'PURGE_PAUSE_SECONDS': 0,  # Pause between purge batches to let other writers in
+    'IMPORT_BACKGROUND_THRESHOLD': 5 * 1024 * 1024,  # Uploads larger than this (bytes) are imported by a job
+    'JOBS_UPLOAD_DIR': os.path.join(tempfile.gettempdir(), 'logistics-jobs'),  # Where queued uploads wait
+    'JOBS_POLL_INTERVAL': 2,  # Seconds the run_jobs worker sleeps when the queue is empty
+    'MAX_PAGE_SIZE': 500,  # Upper bound for the ?limit= page size on list endpoints
+    'RESPONSE_CACHE_ENABLED': True,  # Cache list and detail API responses
+    'RESPONSE_CACHE_ALIAS': 'default',  # Django cache used for responses (locmem or file based)
+    'RESPONSE_CACHE_TIMEOUT': 300,  # Seconds a cached response is kept
+    'CALENDAR_MAX_DAYS': 400,  # Widest window the calendar endpoint serves
+    'ADMIN_EXACT_COUNT_LIMIT': 10000,  # Admin changelists stop counting rows past this
+    'ADMIN_INLINE_PER_PAGE': 25,  # Vehicles shown per page on the booking change form
+    'TEMPLATE_PAGE_SIZE': 50,  # Rows per page on the server-rendered list pages
+    'REQUEST_TIMING_ENABLED': True,  # Time requests and their SQL, adding a Server-Timing header
+    'SLOW_REQUEST_MS': 1000,  # Requests slower than this are written to the slow request log
+    'SLOW_REQUEST_QUERIES': 50,  # ... as are requests running at least this many queries
+    'SLOW_REQUEST_TOP_STATEMENTS': 5,  # Repeated SQL statements listed per slow request
+    'METRICS_ENABLED': True,  # Record request latencies and row counters for /metrics
+    'METRICS_DIR': os.path.join(tempfile.gettempdir(), 'logistics-metrics'),  # Shared by all worker processes
+    'METRICS_FLUSH_INTERVAL': 5,  # Seconds a process may hold new metrics before writing them
+    'PROFILING_ENABLED': True,  # Let staff users profile a request with X-Profile or ?profile=1
+    'PROFILE_PARAM': 'profile',  # Query parameter that asks for a profile
+    'PROFILE_RATE_LIMIT': 5,  # Profiles allowed per window, across all processes
+    'PROFILE_RATE_WINDOW': 60,  # Seconds
+    'PROFILE_DIR': os.path.join(tempfile.gettempdir(), 'logistics-profiles'),  # Where profiles are saved
+    'PROFILE_KEEP': 50,  # Older profiles are deleted
 }
 
 # Get user settings
@@ -24,4 +59,36 @@ BOOKING_NUMBER_REGEX = LOGISTICS_SETTINGS['BOOKING_NUMBER_REGEX']
 DEFAULT_VEHICLE_WEIGHT = LOGISTICS_SETTINGS['DEFAULT_VEHICLE_WEIGHT']
 DEFAULT_VEHICLE_MAKE = LOGISTICS_SETTINGS['DEFAULT_VEHICLE_MAKE']
 DEFAULT_VEHICLE_MODEL = LOGISTICS_SETTINGS['DEFAULT_VEHICLE_MODEL']
+EXPORT_CHUNK_SIZE = LOGISTICS_SETTINGS['EXPORT_CHUNK_SIZE']
+IMPORT_BATCH_SIZE = LOGISTICS_SETTINGS['IMPORT_BATCH_SIZE']
+IMPORT_MAX_BATCH_SIZE = LOGISTICS_SETTINGS['IMPORT_MAX_BATCH_SIZE']
+BULK_ASSIGN_MAX_ITEMS = LOGISTICS_SETTINGS['BULK_ASSIGN_MAX_ITEMS']
+BOOKING_UPSERT_MAX_ITEMS = LOGISTICS_SETTINGS['BOOKING_UPSERT_MAX_ITEMS']
+VEHICLE_UPSERT_MAX_ITEMS = LOGISTICS_SETTINGS['VEHICLE_UPSERT_MAX_ITEMS']
+PURGE_BATCH_SIZE = LOGISTICS_SETTINGS['PURGE_BATCH_SIZE']
+PURGE_PAUSE_SECONDS = LOGISTICS_SETTINGS['PURGE_PAUSE_SECONDS']
+IMPORT_BACKGROUND_THRESHOLD = LOGISTICS_SETTINGS['IMPORT_BACKGROUND_THRESHOLD']
+JOBS_UPLOAD_DIR = LOGISTICS_SETTINGS['JOBS_UPLOAD_DIR']
+JOBS_POLL_INTERVAL = LOGISTICS_SETTINGS['JOBS_POLL_INTERVAL']
+MAX_PAGE_SIZE = LOGISTICS_SETTINGS['MAX_PAGE_SIZE']
+RESPONSE_CACHE_ENABLED = LOGISTICS_SETTINGS['RESPONSE_CACHE_ENABLED']
+RESPONSE_CACHE_ALIAS = LOGISTICS_SETTINGS['RESPONSE_CACHE_ALIAS']
+RESPONSE_CACHE_TIMEOUT = LOGISTICS_SETTINGS['RESPONSE_CACHE_TIMEOUT']
+CALENDAR_MAX_DAYS = LOGISTICS_SETTINGS['CALENDAR_MAX_DAYS']
+ADMIN_EXACT_COUNT_LIMIT = LOGISTICS_SETTINGS['ADMIN_EXACT_COUNT_LIMIT']
+ADMIN_INLINE_PER_PAGE = LOGISTICS_SETTINGS['ADMIN_INLINE_PER_PAGE']
+TEMPLATE_PAGE_SIZE = LOGISTICS_SETTINGS['TEMPLATE_PAGE_SIZE']
+REQUEST_TIMING_ENABLED = LOGISTICS_SETTINGS['REQUEST_TIMING_ENABLED']
+SLOW_REQUEST_MS = LOGISTICS_SETTINGS['SLOW_REQUEST_MS']
+SLOW_REQUEST_QUERIES = LOGISTICS_SETTINGS['SLOW_REQUEST_QUERIES']
+SLOW_REQUEST_TOP_STATEMENTS = LOGISTICS_SETTINGS['SLOW_REQUEST_TOP_STATEMENTS']
+METRICS_ENABLED = LOGISTICS_SETTINGS['METRICS_ENABLED']
+METRICS_DIR = LOGISTICS_SETTINGS['METRICS_DIR']
+METRICS_FLUSH_INTERVAL = LOGISTICS_SETTINGS['METRICS_FLUSH_INTERVAL']
+PROFILING_ENABLED = LOGISTICS_SETTINGS['PROFILING_ENABLED']
+PROFILE_PARAM = LOGISTICS_SETTINGS['PROFILE_PARAM']
+PROFILE_RATE_LIMIT = LOGISTICS_SETTINGS['PROFILE_RATE_LIMIT']
+PROFILE_RATE_WINDOW = LOGISTICS_SETTINGS['PROFILE_RATE_WINDOW']
+PROFILE_DIR = LOGISTICS_SETTINGS['PROFILE_DIR']
+PROFILE_KEEP = LOGISTICS_SETTINGS['PROFILE_KEEP']
 
@@ -10,4 +10,9 @@ class LogisticsConfig(AppConfig):
         """
         Perform initialization tasks when the app is ready.
         """
-        pass  # Can be used for signal registration or other setup
\ No newline at end of file
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401 Registers the booking totals receivers
+        from .search import ensure_search_triggers
+
+        post_migrate.connect(ensure_search_triggers, sender=self)
\ No newline at end of file
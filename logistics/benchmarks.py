@@ -0,0 +1,332 @@
+import gc
+import io
+import json
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .app_settings import RESPONSE_CACHE_ALIAS
+from .models import Booking, Vehicle
+from .seeding import Seeder
+from .vins import generate_vins
+
+# Dataset name: (bookings, vehicles)
+SIZES = {
+    '10k': (1000, 10000),
+    '100k': (10000, 100000),
+    '1m': (50000, 1000000),
+}
+SEED = 1
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baselines.json')
+
+# A run regresses when it is this many times slower or bigger than its baseline
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+# ... and by more than these absolute amounts, so tiny timings are not noise
+TIME_SLACK = 0.05
+MEMORY_SLACK = 256 * 1024
+
+IMPORT_ROWS = 1000
+UPSERT_ROWS = 1000
+# Vehicles deleted by the purge scenario, so its query budget holds for every dataset size
+PURGE_ROWS = 5000
+
+
+class Scenario:
+    """
+    One benchmarked request or command.
+
+    `run` is called with a test client and the dataset context and returns
+    the response, if any. Scenarios that write are rolled back afterwards,
+    and `max_queries` is a query budget that holds for every dataset size.
+    """
+
+    def __init__(self, name, run, max_queries=None, writes=False):
+        self.name = name
+        self.run = run
+        self.max_queries = max_queries
+        self.writes = writes
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries, leaving out transaction control"""
+    ignored = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(self.ignored):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def consume(response):
+    """Read a response to the end, including streamed bodies"""
+    if response is not None and getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def import_file(context):
+    vins = generate_vins(IMPORT_ROWS)
+    lines = ['vin,make,model,weight,booking_number']
+    lines += [f'{vin},Skoda,Octavia,1350,{context["booking_number"]}' for vin in vins]
+    upload = io.BytesIO('\n'.join(lines).encode())
+    upload.name = 'benchmark.csv'
+    return upload
+
+
+def booking_data(context, **overrides):
+    return {
+        'booking_number': context['booking_number'], 'loading_port': 'Emden', 'discharge_port': 'Santos',
+        'ship_departure_date': context['today'].isoformat(),
+        'ship_arrival_date': (context['today'] + timedelta(days=20)).isoformat(),
+        **overrides,
+    }
+
+
+def vehicle_data(context, **overrides):
+    return {'vin': context['vin'], 'make': 'Skoda', 'model': 'Octavia', 'weight': '1350.00',
+            'booking': context['booking'], **overrides}
+
+
+def upsert_bookings(context):
+    """The context booking changed plus new bookings"""
+    items = [booking_data(context, discharge_port='Durban')]
+    items += [booking_data(context, booking_number=f'BK-UPSERT-{i:05d}') for i in range(UPSERT_ROWS - 1)]
+    return json.dumps(items)
+
+
+def upsert_vehicles(context):
+    """The context vehicle moved to another booking plus new vehicles"""
+    items = [{'vin': context['vin'], 'make': 'Skoda', 'model': 'Octavia', 'weight': '1350.00',
+              'booking_number': None}]
+    items += [{'vin': vin, 'make': 'Skoda', 'model': 'Octavia', 'weight': '1350.00',
+               'booking_number': context['booking_number']} for vin in generate_vins(UPSERT_ROWS - 1)]
+    return json.dumps(items)
+
+
+def purge(client, context):
+    call_command('remove_old_vehicles', '--max-rows', str(PURGE_ROWS), stdout=io.StringIO())
+
+
+SCENARIOS = [
+    # Bookings
+    Scenario('booking-list', lambda c, ctx: c.get(reverse('logistics:booking-list')), max_queries=3),
+    Scenario('booking-list-cursor', lambda c, ctx: c.get(
+        reverse('logistics:booking-list'), {'pagination': 'cursor'}), max_queries=2),
+    Scenario('booking-list-expanded', lambda c, ctx: c.get(
+        reverse('logistics:booking-list'), {'expand': 'vehicles'}), max_queries=4),
+    Scenario('booking-retrieve', lambda c, ctx: c.get(
+        reverse('logistics:booking-detail', args=[ctx['booking']])), max_queries=3),
+    Scenario('booking-search', lambda c, ctx: c.get(
+        reverse('logistics:booking-list'), {'search': 'antwerp'}), max_queries=5),
+    Scenario('booking-calendar', lambda c, ctx: c.get(reverse('logistics:booking-calendar'), {
+        'start': ctx['today'].isoformat(), 'end': (ctx['today'] + timedelta(days=42)).isoformat(),
+    }), max_queries=2),
+    Scenario('booking-create', lambda c, ctx: c.post(reverse('logistics:booking-list'), {
+        'booking_number': 'BK-BENCHMARK', 'loading_port': 'Emden', 'discharge_port': 'Santos',
+        'ship_departure_date': ctx['today'].isoformat(),
+        'ship_arrival_date': (ctx['today'] + timedelta(days=20)).isoformat(),
+    }, content_type='application/json'), max_queries=4, writes=True),
+    Scenario('booking-update', lambda c, ctx: c.put(
+        reverse('logistics:booking-detail', args=[ctx['booking']]), booking_data(ctx),
+        content_type='application/json'), max_queries=6, writes=True),
+    Scenario('booking-partial-update', lambda c, ctx: c.patch(
+        reverse('logistics:booking-detail', args=[ctx['booking']]), {'discharge_port': 'Durban'},
+        content_type='application/json'), max_queries=5, writes=True),
+    Scenario('booking-destroy', lambda c, ctx: c.delete(
+        reverse('logistics:booking-detail', args=[ctx['booking']])), max_queries=4, writes=True),
+    Scenario('booking-bulk-upsert', lambda c, ctx: c.post(
+        reverse('logistics:booking-bulk-upsert'), upsert_bookings(ctx),
+        content_type='application/json'), max_queries=12, writes=True),
+    Scenario('booking-add-vehicle', lambda c, ctx: c.post(
+        reverse('logistics:booking-add-vehicle', args=[ctx['booking']]),
+        {'vehicle_id': ctx['unassigned_vehicle']}), max_queries=8, writes=True),
+    Scenario('booking-delete-old-vehicles', lambda c, ctx: c.delete(
+        reverse('logistics:booking-delete-old-vehicles')), max_queries=2, writes=True),
+    Scenario('booking-export-csv', lambda c, ctx: c.get(reverse('logistics:booking-export-csv')), max_queries=1),
+    Scenario('booking-export-excel', lambda c, ctx: c.get(reverse('logistics:booking-export-excel')), max_queries=1),
+    # Vehicles
+    Scenario('vehicle-list', lambda c, ctx: c.get(reverse('logistics:vehicle-list')), max_queries=3),
+    Scenario('vehicle-list-booking', lambda c, ctx: c.get(
+        reverse('logistics:vehicle-list'), {'booking': ctx['booking']}), max_queries=3),
+    Scenario('vehicle-list-sparse', lambda c, ctx: c.get(
+        reverse('logistics:vehicle-list'), {'fields': 'id,vin'}), max_queries=3),
+    Scenario('vehicle-retrieve', lambda c, ctx: c.get(
+        reverse('logistics:vehicle-detail', args=[ctx['vehicle']])), max_queries=2),
+    Scenario('vehicle-search-vin', lambda c, ctx: c.get(
+        reverse('logistics:vehicle-list'), {'search': ctx['vin'][:6]}), max_queries=5),
+    Scenario('vehicle-search-text', lambda c, ctx: c.get(
+        reverse('logistics:vehicle-list'), {'search': 'toyota cor'}), max_queries=4),
+    Scenario('vehicle-create', lambda c, ctx: c.post(reverse('logistics:vehicle-create-vehicle'), {
+        'vin': generate_vins(1)[0], 'make': 'Skoda', 'model': 'Octavia', 'weight': 1350,
+        'booking': ctx['booking'],
+    }), max_queries=8, writes=True),
+    Scenario('vehicle-create-api', lambda c, ctx: c.post(
+        reverse('logistics:vehicle-list'), vehicle_data(ctx, vin=generate_vins(1)[0]),
+        content_type='application/json'), max_queries=6, writes=True),
+    Scenario('vehicle-update', lambda c, ctx: c.put(
+        reverse('logistics:vehicle-detail', args=[ctx['vehicle']]), vehicle_data(ctx, weight='1400.00'),
+        content_type='application/json'), max_queries=6, writes=True),
+    Scenario('vehicle-partial-update', lambda c, ctx: c.patch(
+        reverse('logistics:vehicle-detail', args=[ctx['vehicle']]), {'weight': '1400.00'},
+        content_type='application/json'), max_queries=5, writes=True),
+    Scenario('vehicle-destroy', lambda c, ctx: c.delete(
+        reverse('logistics:vehicle-detail', args=[ctx['vehicle']])), max_queries=4, writes=True),
+    Scenario('vehicle-upsert', lambda c, ctx: c.post(
+        reverse('logistics:vehicle-upsert'), upsert_vehicles(ctx),
+        content_type='application/json'), max_queries=12, writes=True),
+    Scenario('vehicle-create-random', lambda c, ctx: c.post(
+        reverse('logistics:vehicle-create-random-vehicle'), {'booking': ctx['booking']}),
+        max_queries=8, writes=True),
+    Scenario('vehicle-add-to-booking', lambda c, ctx: c.post(
+        reverse('logistics:vehicle-add-to-booking', args=[ctx['unassigned_vehicle']]),
+        {'booking_id': ctx['booking']}), max_queries=10, writes=True),
+    Scenario('vehicle-bulk-assign', lambda c, ctx: c.post(reverse('logistics:vehicle-bulk-assign'), {
+        'booking_id': ctx['booking'], 'filter': {'make': 'Kia'},
+    }, content_type='application/json'), max_queries=6, writes=True),
+    Scenario('vehicle-import', lambda c, ctx: c.post(
+        reverse('logistics:vehicle-import-file'), {'file': import_file(ctx)}), max_queries=12, writes=True),
+    Scenario('vehicle-export-csv', lambda c, ctx: c.get(reverse('logistics:vehicle-export-csv')), max_queries=1),
+    Scenario('vehicle-export-excel', lambda c, ctx: c.get(reverse('logistics:vehicle-export-excel')), max_queries=1),
+    # Server-rendered pages and maintenance
+    Scenario('booking-page', lambda c, ctx: c.get(reverse('booking-list-page')), max_queries=3),
+    Scenario('vehicle-page', lambda c, ctx: c.get(reverse('vehicle-list-page')), max_queries=3),
+    Scenario('purge-old-vehicles', purge, max_queries=25, writes=True),
+]
+
+
+def seed_dataset(size, progress=None):
+    """Seed the current database with a dataset unless it is already there"""
+    bookings, vehicles = SIZES[size]
+    if Booking.objects.count() == bookings and Vehicle.objects.count() == vehicles:
+        return False
+    Seeder(seed=SEED, progress=progress).run(bookings=bookings, vehicles=vehicles)
+    return True
+
+
+def dataset_context():
+    """Ids and values the scenarios refer to"""
+    booking = Booking.objects.filter(vehicle_count__gt=0).order_by('pk').first()
+    vehicle = Vehicle.objects.filter(booking=booking).order_by('pk').first()
+    unassigned = Vehicle.objects.filter(booking__isnull=True).order_by('pk').first()
+    return {
+        'today': timezone.now().replace(hour=0, minute=0, second=0, microsecond=0),
+        'booking': booking.pk,
+        'booking_number': booking.booking_number,
+        'vehicle': vehicle.pk,
+        'vin': vehicle.vin,
+        'unassigned_vehicle': (unassigned or vehicle).pk,
+    }
+
+
+def run_once(scenario, client, context):
+    # Measure the uncached path; the response cache would otherwise answer repeats
+    caches[RESPONSE_CACHE_ALIAS].clear()
+    with transaction.atomic():
+        response = consume(scenario.run(client, context))
+        if scenario.writes:
+            transaction.set_rollback(True)
+    if response is not None and response.status_code >= 400:
+        raise RuntimeError(f'{scenario.name} returned HTTP {response.status_code}')
+
+
+def measure(scenario, client, context, repeat=3):
+    """
+    Return the best wall time, query count and peak traced memory of a scenario.
+
+    The fastest of `repeat` runs is kept, as in timeit: slower runs measure
+    interference from the rest of the machine, not the code.
+    """
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        tracemalloc.start()
+        try:
+            run_once(scenario, client, context)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Time separately, as tracing allocations slows everything down, and
+    # keep the garbage collector out of the timings like timeit does
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_once(scenario, client, context)
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    return {
+        'time': round(min(timings), 4),
+        'queries': queries.count,
+        'memory': peak,
+    }
+
+
+def run_benchmarks(scenarios=SCENARIOS, repeat=3, progress=None):
+    """Measure every scenario on the current database"""
+    client = Client()
+    context = dataset_context()
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = measure(scenario, client, context, repeat)
+        if progress is not None:
+            progress(scenario.name, results[scenario.name])
+    return results
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(size, results, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines[size] = results
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def find_regressions(results, baselines, scenarios=SCENARIOS,
+                     time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """Return a message for every result over its query budget or baseline"""
+    budgets = {scenario.name: scenario.max_queries for scenario in scenarios}
+    regressions = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if budget is not None and result['queries'] > budget:
+            regressions.append(f'{name}: {result["queries"]} queries, budget is {budget}')
+
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        if result['queries'] > baseline['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries, baseline is {baseline["queries"]}')
+        if (result['time'] > baseline['time'] * time_tolerance
+                and result['time'] - baseline['time'] > TIME_SLACK):
+            regressions.append(f'{name}: {result["time"]:.4f}s, baseline is {baseline["time"]:.4f}s')
+        if (result['memory'] > baseline['memory'] * memory_tolerance
+                and result['memory'] - baseline['memory'] > MEMORY_SLACK):
+            regressions.append(
+                f'{name}: {result["memory"] // 1024} KiB peak, baseline is {baseline["memory"] // 1024} KiB'
+            )
+    return regressions
@@ -0,0 +1,125 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import metrics
+from .app_settings import RESPONSE_CACHE_ALIAS, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_TIMEOUT
+
+HITS_KEY = 'logistics:cache:hits'
+MISSES_KEY = 'logistics:cache:misses'
+
+
+def get_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def version_key(label):
+    return f'logistics:cache:version:{label}'
+
+
+def get_version(label):
+    """
+    Return the current cache version for a model label.
+
+    Missing versions start from the current time in milliseconds rather
+    than 1, so a version evicted from the cache never comes back to a value
+    that old entries are still stored under.
+    """
+    cache = get_cache()
+    key = version_key(label)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(labels):
+    cache = get_cache()
+    for label in labels:
+        try:
+            cache.incr(version_key(label))
+        except ValueError:
+            cache.set(version_key(label), int(time.time() * 1000), timeout=None)
+
+
+def bump_version(*labels):
+    """
+    Invalidate every cached response for the given model labels.
+
+    The bump happens straight away and again once the surrounding
+    transaction commits, so a response cached by a concurrent request from
+    the not yet committed data is not served afterwards.
+    """
+    _bump(labels)
+    transaction.on_commit(lambda: _bump(labels))
+
+
+def increment(key):
+    cache = get_cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    """Return the response cache hit and miss counters"""
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def response_cache_key(request, labels):
+    versions = '.'.join(str(get_version(label)) for label in labels)
+    renderer = getattr(request, 'accepted_renderer', None)
+    path = f"{getattr(renderer, 'format', '')}:{request.get_full_path()}"
+    digest = hashlib.md5(path.encode()).hexdigest()
+    return f'logistics:cache:response:{versions}:{digest}'
+
+
+class CachedResponseMixin:
+    """
+    Cache list and retrieve responses of a viewset.
+
+    Entries are keyed on the request path and the versions of the models
+    listed in `cache_labels`; any write to those models bumps a version
+    (see logistics.signals), so stale entries are never served.
+    """
+    cache_labels = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        if not RESPONSE_CACHE_ENABLED:
+            return view(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_cache_key(request, self.cache_labels)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            metrics.inc('logistics_response_cache_total', result='hit')
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        increment(MISSES_KEY)
+        metrics.inc('logistics_response_cache_total', result='miss')
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
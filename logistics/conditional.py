@@ -0,0 +1,77 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_version
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve requests with an ETag, and return 304 Not
+    Modified for a matching If-None-Match without serializing the payload.
+
+    The ETag is built from the request path and format and the cache
+    versions of `cache_labels`, which every write bumps, including deletes
+    and bulk updates, so lists are revalidated without touching the
+    database. Detail responses also get a Last-Modified from aggregates
+    over the single row, see get_validator_aggregates.
+    """
+
+    def get_validator_aggregates(self, detail):
+        """Aggregates whose values change whenever the payload changes"""
+        return {
+            'last_modified': Max('updated_at'),
+            'count': Count('pk', distinct=True),
+        }
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, None, False, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            # A lookup value of the wrong type, as DRF's get_object_or_404 treats it
+            raise Http404
+        return self.conditional_response(super().retrieve, queryset, True, request, *args, **kwargs)
+
+    def get_validators(self, request, queryset, detail):
+        versions = [f'{label}={get_version(label)}' for label in self.cache_labels]
+        aggregates = {}
+        last_modified = None
+        if detail:
+            aggregates = queryset.order_by().aggregate(**self.get_validator_aggregates(detail))
+            timestamps = [value for key, value in aggregates.items() if key.endswith('last_modified') and value]
+            last_modified = max(timestamps) if timestamps else None
+
+        renderer = getattr(request, 'accepted_renderer', None)
+        fingerprint = '|'.join(
+            [getattr(renderer, 'format', ''), request.get_full_path(), *versions]
+            + [f'{key}={value.isoformat() if hasattr(value, "isoformat") else value}'
+               for key, value in sorted(aggregates.items())]
+        )
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, view, queryset, detail, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, queryset, detail)
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified_ts
+        )
+        response = not_modified if not_modified is not None else view(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified_ts is not None:
+                response['Last-Modified'] = http_date(last_modified_ts)
+            # Let clients keep the payload but always revalidate it
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Accept',))
+        return response
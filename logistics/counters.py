@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Booking, Vehicle
+
+
+class CounterDeltas:
+    """
+    Accumulate per-booking changes to vehicle_count and total_weight and
+    apply them with F() expression UPDATEs, one per batch of bookings.
+
+    The change of each booking is picked with a CASE on its id, written as
+    raw SQL because building a When() per booking costs far more than
+    running the statement.
+    """
+
+    # Bookings per UPDATE, keeping the statement under SQLite's parameter limit
+    batch_size = 1000
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [0, Decimal('0')])
+
+    def add(self, booking_id, count, weight):
+        if booking_id is None:
+            return
+        delta = self.deltas[booking_id]
+        delta[0] += count
+        delta[1] += Decimal(str(weight or 0))
+
+    def add_grouped(self, queryset, sign=1):
+        """Add the vehicles of a queryset with one grouped query"""
+        rows = (
+            queryset.order_by()
+            .values('booking_id')
+            .annotate(count=Count('id'), weight=Sum('weight'))
+            .filter(booking_id__isnull=False)
+        )
+        for row in rows:
+            self.add(row['booking_id'], sign * row['count'], sign * (row['weight'] or 0))
+
+    def apply(self):
+        now = timezone.now()
+        deltas = [(pk, count, weight) for pk, (count, weight) in self.deltas.items() if count or weight]
+        self.deltas.clear()
+        pk_column = connection.ops.quote_name(Booking._meta.pk.column)
+        for start in range(0, len(deltas), self.batch_size):
+            batch = deltas[start:start + self.batch_size]
+            case = f'CASE {pk_column}{" WHEN %s THEN %s" * len(batch)} ELSE 0 END'
+            count = RawSQL(case, [value for pk, count, _ in batch for value in (pk, count)],
+                           output_field=IntegerField())
+            weight = RawSQL(case, [value for pk, _, weight in batch for value in (pk, weight)],
+                            output_field=DecimalField(max_digits=12, decimal_places=2))
+            Booking.objects.filter(pk__in=[pk for pk, _, _ in batch]).update(
+                vehicle_count=F('vehicle_count') + count,
+                total_weight=F('total_weight') + weight,
+                updated_at=now
+            )
+
+
+def apply_grouped(queryset, sign=1):
+    """
+    Add the vehicles of a queryset to their bookings' totals, or take them
+    off with sign=-1, with a single UPDATE whatever the number of bookings.
+    Call it while the queryset still selects the vehicles, i.e. before
+    they are moved or deleted.
+
+    Each booking's share is counted through the vehicle booking index, so
+    this suits filters matching any number of vehicles; for a list of ids,
+    which the subqueries would probe once per booking, use
+    CounterDeltas.add_grouped.
+    """
+    vehicles = queryset.filter(booking=OuterRef('pk')).order_by().values('booking')
+    count = Subquery(vehicles.annotate(count=Count('id')).values('count'))
+    weight = Subquery(vehicles.annotate(weight=Sum('weight')).values('weight'),
+                      output_field=DecimalField(max_digits=12, decimal_places=2))
+    return Booking.objects.filter(pk__in=queryset.order_by().values('booking_id')).update(
+        vehicle_count=F('vehicle_count') + sign * count,
+        total_weight=F('total_weight') + sign * weight,
+        updated_at=timezone.now()
+    )
+
+
+def actual_totals():
+    """Subqueries computing each booking's live vehicle count and weight"""
+    vehicles = Vehicle.objects.filter(booking=OuterRef('pk')).order_by().values('booking')
+    count = Subquery(vehicles.annotate(count=Count('id')).values('count'))
+    weight = Subquery(vehicles.annotate(weight=Sum('weight')).values('weight'))
+    return (
+        Coalesce(count, 0),
+        Coalesce(weight, Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
+def find_counter_drift(queryset=None):
+    """Return the bookings whose stored totals differ from their vehicles"""
+    if queryset is None:
+        queryset = Booking.objects.all()
+    count, weight = actual_totals()
+    return (
+        queryset.annotate(actual_count=count, actual_weight=weight)
+        # Compare weights to the cent so float storage on SQLite is not reported as drift
+        .annotate(weight_drift=Abs(F('total_weight') - F('actual_weight')))
+        .filter(~Q(vehicle_count=F('actual_count')) | Q(weight_drift__gte=Decimal('0.005')))
+    )
+
+
+def recount_bookings(queryset=None):
+    """Recompute the stored totals of the bookings with a single UPDATE"""
+    if queryset is None:
+        queryset = Booking.objects.all()
+    count, weight = actual_totals()
+    updated = queryset.update(vehicle_count=count, total_weight=weight)
+    bump_version('booking')
+    return updated
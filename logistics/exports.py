@@ -0,0 +1,77 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+
+from . import metrics
+from .app_settings import EXPORT_CHUNK_SIZE
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer that hands each written line straight back
+    instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows):
+    """Yield the CSV lines for the headers and each row as they are produced"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        yield writer.writerow(row)
+    metrics.inc('logistics_rows_exported_total', count, format='csv')
+
+
+def iter_rows(queryset, fields):
+    """Walk the queryset in chunks, yielding flat tuples of the given fields"""
+    return queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(queryset, fields, headers, filename):
+    """
+    Return a StreamingHttpResponse that writes the queryset as CSV without
+    building the whole file in memory.
+    """
+    response = StreamingHttpResponse(
+        iter_csv(headers, iter_rows(queryset, fields)),
+        content_type='text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_xlsx(rows, headers, filename, sheet_name):
+    """
+    Return a FileResponse with the rows written as an XLSX workbook.
+
+    The workbook is built with xlsxwriter's constant_memory mode, which
+    flushes each row to disk once the next one starts, and assembled in a
+    temporary file that is streamed back and removed when the response is
+    closed.
+    """
+    import xlsxwriter
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(sheet_name)
+
+    worksheet.write_row(0, 0, headers)
+    row_num = 0
+    for row_num, row in enumerate(rows, 1):
+        worksheet.write_row(row_num, 0, row)
+    metrics.inc('logistics_rows_exported_total', row_num, format='xlsx')
+
+    workbook.close()
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
@@ -0,0 +1,240 @@
+import csv
+import io
+import os
+import re
+import zipfile
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import metrics
+from .app_settings import VIN_VALIDATOR_REGEX, IMPORT_BATCH_SIZE
+from .cache import bump_version
+from .counters import CounterDeltas
+from .models import Booking, Vehicle
+
+# Header aliases so files produced by our own exports can be re-imported
+HEADER_ALIASES = {
+    'booking': 'booking_number',
+}
+UNASSIGNED_VALUES = ('', 'not assigned')
+
+
+def normalize_header(header):
+    key = str(header or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def iter_csv_rows(fileobj):
+    """Yield one dict per CSV row, reading the upload as a stream"""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        headers = [normalize_header(h) for h in next(reader, [])]
+        for values in reader:
+            yield dict(zip(headers, values))
+    except csv.Error as e:
+        raise ValueError(f'Malformed CSV file: {e}')
+    finally:
+        # Don't let the wrapper close the underlying upload
+        text.detach()
+
+
+def iter_xlsx_rows(fileobj):
+    """Yield one dict per row of the first worksheet, reading it as a stream"""
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError('XLSX import requires the openpyxl package')
+
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+        raise ValueError(f'Malformed XLSX file: {e}')
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [normalize_header(h) for h in next(rows, [])]
+        for values in rows:
+            yield dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def check_upload_name(name):
+    """Return the lower-cased extension of a supported upload name"""
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        raise ValueError('Unsupported file type. Please upload a .csv or .xlsx file.')
+    return extension
+
+
+def iter_upload_rows(upload):
+    """
+    Pick the row reader for an uploaded file from its extension. Files
+    that cannot be parsed raise ValueError while they are read.
+    """
+    if check_upload_name(upload.name) == '.csv':
+        return iter_csv_rows(upload)
+    return iter_xlsx_rows(upload)
+
+
+def clean_cell(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+class VehicleImporter:
+    """
+    Import vehicles from an iterable of row dicts in batches.
+
+    Each batch is validated in bulk: VINs are matched against
+    VIN_VALIDATOR_REGEX, existing VINs and booking numbers are each resolved
+    with a single IN query, and the valid rows are written with bulk_create.
+    Invalid rows are skipped and reported by their 1-based data row number.
+    `progress` is called with the number of rows read after each batch.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rows_processed = 0
+        self.vin_regex = re.compile(VIN_VALIDATOR_REGEX)
+        self.make_field = Vehicle._meta.get_field('make')
+        self.model_field = Vehicle._meta.get_field('model')
+        self.weight_field = Vehicle._meta.get_field('weight')
+        self.bookings = {}
+        self.seen_vins = set()
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows, strict=False, atomic=True):
+        """
+        Import all rows and return the report.
+
+        With strict=True nothing is written if any row is invalid. Rows are
+        written in one transaction unless atomic=False, in which case each
+        batch is committed on its own (used by background jobs so progress
+        is visible and other writers get a turn); strict imports are always
+        atomic.
+        """
+        rows = enumerate(rows, 1)
+        if not atomic and not strict:
+            while self.next_batch(rows, atomic=True):
+                pass
+            metrics.inc('logistics_rows_imported_total', self.created)
+            return self.report()
+
+        with transaction.atomic():
+            while self.next_batch(rows):
+                pass
+
+            if strict and self.errors:
+                transaction.set_rollback(True)
+                self.created = 0
+
+        metrics.inc('logistics_rows_imported_total', self.created)
+        return self.report()
+
+    def next_batch(self, rows, atomic=False):
+        """Import the next batch of rows, returning False once they run out"""
+        batch = list(islice(rows, self.batch_size))
+        if not batch:
+            return False
+
+        if atomic:
+            with transaction.atomic():
+                self.import_batch(batch)
+        else:
+            self.import_batch(batch)
+
+        self.rows_processed += len(batch)
+        if self.progress is not None:
+            self.progress(self.rows_processed)
+        return True
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+    def import_batch(self, batch):
+        parsed = []
+        batch_errors = []
+        for row_number, row in batch:
+            vehicle, errors = self.parse_row(row)
+            if errors:
+                batch_errors.append({'row': row_number, 'vin': vehicle['vin'], 'errors': errors})
+            else:
+                parsed.append((row_number, vehicle))
+
+        self.resolve_bookings({v['booking_number'] for _, v in parsed if v['booking_number']})
+        existing = set(
+            Vehicle.objects.filter(vin__in=[v['vin'] for _, v in parsed])
+            .values_list('vin', flat=True)
+        )
+
+        vehicles = []
+        for row_number, vehicle in parsed:
+            errors = []
+            number = vehicle.pop('booking_number')
+            if number and number not in self.bookings:
+                errors.append(f'Booking {number} does not exist')
+            if vehicle['vin'] in existing:
+                errors.append('A vehicle with this VIN already exists')
+            elif vehicle['vin'] in self.seen_vins:
+                errors.append('Duplicate VIN in file')
+
+            if errors:
+                batch_errors.append({'row': row_number, 'vin': vehicle['vin'], 'errors': errors})
+                continue
+
+            self.seen_vins.add(vehicle['vin'])
+            vehicles.append(Vehicle(booking_id=self.bookings.get(number), **vehicle))
+
+        Vehicle.objects.bulk_create(vehicles, batch_size=self.batch_size)
+        self.created += len(vehicles)
+
+        # bulk_create skips signals, so update the booking totals here
+        deltas = CounterDeltas()
+        for vehicle in vehicles:
+            deltas.add(vehicle.booking_id, 1, vehicle.weight)
+        deltas.apply()
+        if vehicles:
+            bump_version('booking', 'vehicle')
+        self.errors.extend(sorted(batch_errors, key=lambda error: error['row']))
+
+    def parse_row(self, row):
+        vehicle = {
+            'vin': clean_cell(row.get('vin')),
+            'make': clean_cell(row.get('make')),
+            'model': clean_cell(row.get('model')),
+            'weight': clean_cell(row.get('weight')),
+            'booking_number': clean_cell(row.get('booking_number')),
+        }
+        if vehicle['booking_number'].lower() in UNASSIGNED_VALUES:
+            vehicle['booking_number'] = ''
+
+        errors = []
+        if not self.vin_regex.match(vehicle['vin']):
+            errors.append('VIN must be a valid 17-character Vehicle Identification Number')
+        for name, field in (('make', self.make_field), ('model', self.model_field),
+                            ('weight', self.weight_field)):
+            try:
+                vehicle[name] = field.clean(vehicle[name], None)
+            except ValidationError as e:
+                errors.append(f"{name}: {' '.join(e.messages)}")
+        return vehicle, errors
+
+    def resolve_bookings(self, numbers):
+        """Look up the booking ids for numbers not seen in earlier batches"""
+        missing = numbers - self.bookings.keys()
+        if missing:
+            self.bookings.update(
+                Booking.objects.filter(booking_number__in=missing)
+                .values_list('booking_number', 'id')
+            )
@@ -0,0 +1,113 @@
+import logging
+import os
+import uuid
+
+from django.core.files import File
+from django.utils import timezone
+
+from .app_settings import JOBS_UPLOAD_DIR
+from .importers import VehicleImporter, check_upload_name, iter_upload_rows
+from .maintenance import purge_old_vehicles
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind, **params):
+    """Queue a job of the given kind for the run_jobs worker"""
+    return Job.objects.create(kind=kind, params=params)
+
+
+def enqueue_vehicle_import(upload, batch_size, strict=False):
+    """
+    Save an uploaded file to JOBS_UPLOAD_DIR and queue its import, so the
+    request can return before the rows are processed.
+    """
+    extension = check_upload_name(upload.name)
+    os.makedirs(JOBS_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(JOBS_UPLOAD_DIR, f'{uuid.uuid4().hex}{extension}')
+    with open(path, 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+
+    return enqueue(
+        Job.KIND_IMPORT_VEHICLES,
+        path=path,
+        name=upload.name,
+        batch_size=batch_size,
+        strict=strict,
+    )
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to running and return it, or
+    None when the queue is empty. The conditional UPDATE makes sure two
+    workers never pick up the same job.
+    """
+    while True:
+        job = Job.objects.filter(status=Job.STATUS_PENDING).order_by('id').first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING,
+            started_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome"""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        job.result = handler(job)
+        job.status = Job.STATUS_SUCCEEDED
+    except Exception as e:
+        logger.exception("Job %s failed", job.pk)
+        job.error = str(e)
+        job.status = Job.STATUS_FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def requeue_running_jobs():
+    """Put jobs left running by a stopped worker back in the queue"""
+    return Job.objects.filter(status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_PENDING,
+        started_at=None,
+        updated_at=timezone.now()
+    )
+
+
+def run_purge_old_vehicles(job):
+    deleted = purge_old_vehicles(
+        progress=job.reportProgress,
+        **job.params
+    )
+    return {'deleted': deleted}
+
+
+def run_import_vehicles(job):
+    params = job.params
+    try:
+        with open(params['path'], 'rb') as fileobj:
+            # The row readers pick the format from the original file name
+            rows = iter_upload_rows(File(fileobj, name=params['name']))
+            importer = VehicleImporter(batch_size=params['batch_size'], progress=job.reportProgress)
+            report = importer.run(rows, strict=params.get('strict', False), atomic=False)
+    finally:
+        if os.path.exists(params['path']):
+            os.remove(params['path'])
+    return report
+
+
+HANDLERS = {
+    Job.KIND_PURGE_OLD_VEHICLES: run_purge_old_vehicles,
+    Job.KIND_IMPORT_VEHICLES: run_import_vehicles,
+}
@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics
+from .app_settings import OLD_VEHICLES_DAYS, PURGE_BATCH_SIZE
+from .cache import bump_version
+from .counters import CounterDeltas
+from .models import Vehicle
+
+
+def get_old_vehicles(days=OLD_VEHICLES_DAYS):
+    """Return vehicles with bookings that arrived more than `days` days ago"""
+    cutoff_date = timezone.now() - timedelta(days=days)
+    return Vehicle.objects.filter(booking__ship_arrival_date__lt=cutoff_date)
+
+
+def count_old_vehicles(days=OLD_VEHICLES_DAYS, max_rows=None):
+    """Count the vehicles a purge would delete, stopping at max_rows"""
+    queryset = get_old_vehicles(days).order_by()
+    if max_rows is not None:
+        return queryset[:max_rows].count()
+    return queryset.count()
+
+
+def purge_old_vehicles(days=OLD_VEHICLES_DAYS, batch_size=PURGE_BATCH_SIZE, max_rows=None,
+                       pause=0, raw=True, progress=None):
+    """
+    Delete old vehicles in primary-key-ordered batches and return the count.
+
+    Every batch runs in its own short transaction so other writers get a
+    turn in between, optionally sleeping `pause` seconds. With `raw` the
+    batch is removed with a single DELETE instead of going through the
+    deletion collector, which is safe because nothing references Vehicle.
+    `progress` is called with the running total after each batch.
+    """
+    queryset = get_old_vehicles(days).order_by('pk')
+    deleted = 0
+    last_pk = 0
+
+    while max_rows is None or deleted < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - deleted)
+
+        with transaction.atomic():
+            ids = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:limit])
+            if not ids:
+                break
+            batch = Vehicle.objects.filter(pk__in=ids)
+            if raw:
+                # The raw DELETE skips signals, so update the booking totals here
+                deltas = CounterDeltas()
+                deltas.add_grouped(batch, sign=-1)
+                count = batch._raw_delete(batch.db)
+                deltas.apply()
+                bump_version('booking', 'vehicle')
+            else:
+                count = batch.delete()[0]
+
+        deleted += count
+        metrics.inc('logistics_rows_purged_total', count)
+        last_pk = ids[-1]
+        if progress is not None:
+            progress(deleted)
+        if pause:
+            time.sleep(pause)
+
+    return deleted
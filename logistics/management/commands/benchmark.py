@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from logistics import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Seeds a benchmark database and measures time, SQL queries and peak memory of every '
+            'API action, export, page and the purge, failing on regressions against the baselines')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            choices=list(benchmarks.SIZES),
+            default='10k',
+            help='Dataset to benchmark against (default: 10k)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per scenario; the fastest is reported (default: 3)'
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            default=None,
+            help='Only run this scenario (can be repeated)'
+        )
+        parser.add_argument(
+            '--keep-db',
+            action='store_true',
+            help='Keep the seeded benchmark database and reuse it next time'
+        )
+        parser.add_argument(
+            '--update-baselines',
+            action='store_true',
+            help='Store the results as the new baselines instead of comparing'
+        )
+        parser.add_argument(
+            '--time-tolerance',
+            type=float,
+            default=benchmarks.TIME_TOLERANCE,
+            help=f'Allowed slowdown factor over the baseline (default: {benchmarks.TIME_TOLERANCE})'
+        )
+        parser.add_argument(
+            '--memory-tolerance',
+            type=float,
+            default=benchmarks.MEMORY_TOLERANCE,
+            help=f'Allowed peak memory factor over the baseline (default: {benchmarks.MEMORY_TOLERANCE})'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Also write the results as JSON to this file'
+        )
+
+    def handle(self, *args, **options):
+        size = options['size']
+        scenarios = benchmarks.SCENARIOS
+        if options['scenario']:
+            names = {scenario.name for scenario in scenarios}
+            unknown = set(options['scenario']) - names
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['scenario']]
+
+        test_settings = connections['default'].settings_dict['TEST']
+        if connections['default'].vendor == 'sqlite' and not test_settings.get('NAME'):
+            # An in-memory database would neither be realistic nor reusable
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), f'logistics-benchmark-{size}.sqlite3')
+
+        # Same isolation as the test runner: a separate database and the test client host
+        setup_test_environment(debug=False)
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keep_db'], aliases={'default'}
+        )
+        try:
+            results = self.run(size, scenarios, options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keep_db'])
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({size: results}, f, indent=2, sort_keys=True)
+
+        if options['update_baselines']:
+            benchmarks.save_baselines(size, results)
+            self.stdout.write(self.style.SUCCESS(f'Stored {len(results)} baselines for the {size} dataset'))
+            return
+
+        regressions = benchmarks.find_regressions(
+            results, benchmarks.load_baselines().get(size, {}), scenarios,
+            time_tolerance=options['time_tolerance'], memory_tolerance=options['memory_tolerance'],
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark regressions on the {size} dataset')
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} benchmarks within budget'))
+
+    def run(self, size, scenarios, options):
+        self.stdout.write(f'Preparing the {size} dataset...')
+        seeded = benchmarks.seed_dataset(
+            size, progress=lambda kind, count: self.stdout.write(f'Seeded {count} {kind} so far...')
+        )
+        if not seeded:
+            self.stdout.write('Reusing the existing dataset')
+
+        self.stdout.write(f'{"scenario":<30} {"time (s)":>10} {"queries":>8} {"peak (KiB)":>11}')
+
+        def progress(name, result):
+            self.stdout.write(
+                f'{name:<30} {result["time"]:>10.4f} {result["queries"]:>8} {result["memory"] // 1024:>11}'
+            )
+
+        return benchmarks.run_benchmarks(scenarios, repeat=options['repeat'], progress=progress)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from logistics.profiling import list_profiles, profile_stats
+
+
+class Command(BaseCommand):
+    help = 'Lists the request profiles captured for staff users, or summarizes one of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help='Show the top functions of this profile')
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            help='pstats sort key for the summary, e.g. cumulative, tottime or ncalls'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=25,
+            help='Number of functions in the summary'
+        )
+
+    def handle(self, *args, **options):
+        profiles = list_profiles()
+
+        if options['profile_id']:
+            meta = next((p for p in profiles if p['id'] == options['profile_id']), None)
+            if meta is None:
+                raise CommandError(f'Profile {options["profile_id"]} not found')
+            self.stdout.write(
+                f'{meta["method"]} {meta["path"]} ({meta["view"]}) by {meta["user"]}: '
+                f'HTTP {meta["status"]} in {meta["duration_ms"]} ms'
+            )
+            self.stdout.write(profile_stats(meta['id'], options['sort'], options['limit']))
+            return
+
+        if not profiles:
+            self.stdout.write('No profiles captured')
+            return
+        for meta in profiles:
+            incomplete = '' if meta['complete'] else ' (partial)'
+            self.stdout.write(
+                f'{meta["id"]}  {meta["duration_ms"]:>10.2f} ms  {meta["status"]}  '
+                f'{meta["method"]} {meta["path"]}  {meta["view"]}{incomplete}'
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from logistics.counters import find_counter_drift, recount_bookings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized vehicle_count and total_weight of every booking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report bookings whose stored totals are out of date'
+        )
+
+    def handle(self, *args, **options):
+        drift = list(find_counter_drift().values_list(
+            'booking_number', 'vehicle_count', 'actual_count', 'total_weight', 'actual_weight'
+        ))
+
+        for number, count, actual_count, weight, actual_weight in drift:
+            self.stdout.write(
+                f'Booking {number}: stored {count} vehicles / {weight} kg, '
+                f'actual {actual_count} vehicles / {actual_weight} kg'
+            )
+
+        if options['verify']:
+            if drift:
+                raise CommandError(f'{len(drift)} bookings have out of date vehicle totals')
+            self.stdout.write(self.style.SUCCESS('All booking vehicle totals are up to date'))
+            return
+
+        updated = recount_bookings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted {updated} bookings, {len(drift)} had out of date totals')
+        )
@@ -1,8 +1,6 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from logistics.models import Vehicle
-from logistics.app_settings import OLD_VEHICLES_DAYS
+from django.core.management.base import BaseCommand, CommandError
+from logistics.app_settings import OLD_VEHICLES_DAYS, PURGE_BATCH_SIZE, PURGE_PAUSE_SECONDS
+from logistics.maintenance import count_old_vehicles, purge_old_vehicles
 
 
 class Command(BaseCommand):
@@ -15,25 +13,66 @@ class Command(BaseCommand):
             default=OLD_VEHICLES_DAYS,
             help=f'Number of days to consider (default: {OLD_VEHICLES_DAYS} days)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help=f'Vehicles deleted per transaction (default: {PURGE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=PURGE_PAUSE_SECONDS,
+            help=f'Seconds to pause between batches (default: {PURGE_PAUSE_SECONDS})'
+        )
+        parser.add_argument(
+            '--max-rows',
+            type=int,
+            default=None,
+            help='Stop after deleting this many vehicles'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many vehicles would be deleted'
+        )
+        parser.add_argument(
+            '--no-raw',
+            action='store_true',
+            help='Delete through the ORM collector instead of a raw DELETE per batch'
+        )
 
     def handle(self, *args, **options):
         days = options['days']
-        cutoff_date = timezone.now() - timedelta(days=days)
+        max_rows = options['max_rows']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if max_rows is not None and max_rows < 1:
+            raise CommandError('--max-rows must be at least 1')
+
+        if options['dry_run']:
+            count = count_old_vehicles(days, max_rows=max_rows)
+            self.stdout.write(
+                self.style.SUCCESS(f'Dry run: {count} vehicles with bookings older than {days} days would be deleted')
+            )
+            return
 
         self.stdout.write(f'Removing vehicles with bookings older than {days} days...')
 
-        old_vehicles = Vehicle.objects.filter(
-            booking__ship_arrival_date__lt=cutoff_date
+        count = purge_old_vehicles(
+            days=days,
+            batch_size=options['batch_size'],
+            max_rows=max_rows,
+            pause=options['sleep'],
+            raw=not options['no_raw'],
+            progress=lambda deleted: self.stdout.write(f'  deleted {deleted} vehicles so far'),
         )
 
-        count = old_vehicles.count()
-
         if count > 0:
-            old_vehicles.delete()
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully deleted {count} vehicles with bookings older than {days} days')
             )
         else:
             self.stdout.write(
                 self.style.SUCCESS(f'No vehicles found with bookings older than {days} days')
-            )
\ No newline at end of file
+            )
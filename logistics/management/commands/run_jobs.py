@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from logistics.app_settings import JOBS_POLL_INTERVAL
+from logistics.jobs import claim_next_job, requeue_running_jobs, run_job
+from logistics.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs such as purges and large imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=JOBS_POLL_INTERVAL,
+            help=f'Seconds to wait when the queue is empty (default: {JOBS_POLL_INTERVAL})'
+        )
+        parser.add_argument(
+            '--requeue-running',
+            action='store_true',
+            help='Requeue jobs left running by a worker that stopped'
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            count = requeue_running_jobs()
+            self.stdout.write(f'Requeued {count} running jobs')
+
+        self.stdout.write('Waiting for jobs...')
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Running {job}')
+                job = run_job(job)
+                if job.status == Job.STATUS_SUCCEEDED:
+                    self.stdout.write(self.style.SUCCESS(f'Finished {job}: {job.result}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Failed {job}: {job.error}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from logistics.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Creates synthetic bookings and vehicles for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bookings',
+            type=int,
+            default=1000,
+            help='Number of bookings to create (default: 1000)'
+        )
+        parser.add_argument(
+            '--vehicles',
+            type=int,
+            default=10000,
+            help='Number of vehicles to create (default: 10000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed, for a reproducible dataset'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows inserted per bulk_create (default: 5000)'
+        )
+        parser.add_argument(
+            '--unassigned',
+            type=float,
+            default=0.05,
+            help='Share of vehicles left without a booking (default: 0.05)'
+        )
+
+    def handle(self, *args, **options):
+        if options['bookings'] < 0 or options['vehicles'] < 0:
+            raise CommandError('--bookings and --vehicles must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if not 0 <= options['unassigned'] <= 1:
+            raise CommandError('--unassigned must be between 0 and 1')
+
+        def progress(kind, count):
+            self.stdout.write(f'Created {count} {kind} so far...')
+
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            unassigned=options['unassigned'],
+            progress=progress,
+        )
+        bookings, vehicles = seeder.run(bookings=options['bookings'], vehicles=options['vehicles'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully created {bookings} bookings and {vehicles} vehicles')
+        )
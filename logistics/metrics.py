@@ -0,0 +1,178 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from bisect import bisect_left
+
+from . import app_settings
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Name: (type, help)
+METRICS = {
+    'logistics_requests_total': ('counter', 'Requests by view, method and status'),
+    'logistics_request_errors_total': ('counter', 'Requests answered with a server error'),
+    'logistics_request_duration_seconds': ('histogram', 'Request latency by view and method'),
+    'logistics_rows_exported_total': ('counter', 'Rows written by CSV and Excel exports'),
+    'logistics_rows_imported_total': ('counter', 'Vehicles created by file imports'),
+    'logistics_rows_purged_total': ('counter', 'Old vehicles deleted by purges'),
+    'logistics_response_cache_total': ('counter', 'API response cache lookups by result'),
+}
+
+
+def series_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+class Registry:
+    """
+    Counters and histograms of one process, shared through a directory.
+
+    Every process keeps its metrics in memory and writes them to its own
+    JSON file in `directory` at most `flush_interval` seconds after they
+    change; `collect` adds up the files of all processes, so any worker can
+    answer a scrape for the whole server. File names carry a token drawn
+    at process start, so a new process reusing an old pid never overwrites
+    the old file. Files of exited processes are kept so counters never go
+    backwards; clear the directory on deploy.
+    """
+
+    def __init__(self, directory, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.token = uuid.uuid4().hex
+        self.counters = {}
+        self.histograms = {}
+        self.timer = None
+
+    def check_pid(self):
+        # A forked worker starts from a copy of its parent's metrics
+        if os.getpid() != self.pid:
+            self.reset()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'{self.pid}-{self.token}.json')
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.check_pid()
+            key = series_key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.schedule_flush()
+
+    def observe(self, name, value, **labels):
+        """Record a histogram sample, e.g. a latency in seconds"""
+        with self.lock:
+            self.check_pid()
+            key = series_key(name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # One count per bucket plus +Inf, then the sum of samples
+                histogram = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            histogram[bisect_left(LATENCY_BUCKETS, value)] += 1
+            histogram[-1] += value
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        if self.timer is None:
+            self.timer = threading.Timer(self.flush_interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Write this process's metrics to its file"""
+        with self.lock:
+            self.check_pid()
+            self.timer = None
+            data = {'counters': self.counters, 'histograms': self.histograms}
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f'{self.path}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+
+    def collect(self):
+        """Return the counters and histograms of all processes added up"""
+        self.flush()
+        counters = {}
+        histograms = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, value in data['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, values in data['histograms'].items():
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return counters, histograms
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def render(counters, histograms):
+    """Format collected metrics in the Prometheus text exposition format"""
+    series = {}
+    for key, value in counters.items():
+        name, labels = json.loads(key)
+        series.setdefault(name, []).append((labels, value))
+    for key, values in histograms.items():
+        name, labels = json.loads(key)
+        series.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(series[name], key=lambda item: item[0]):
+            if kind != 'histogram':
+                lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry(app_settings.METRICS_DIR, app_settings.METRICS_FLUSH_INTERVAL)
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    if app_settings.METRICS_ENABLED and value:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Add a sample to a histogram"""
+    if app_settings.METRICS_ENABLED:
+        registry.observe(name, value, **labels)
+
+
+def exposition():
+    """Return the metrics of all processes as Prometheus text"""
+    return render(*registry.collect())
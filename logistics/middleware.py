@@ -0,0 +1,235 @@
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import app_settings, metrics
+from .profiling import RequestProfile, acquire_slot, profile_requested
+
+logger = logging.getLogger('logistics.slow_requests')
+
+# Collapses IN (%s, %s, ...) lists so statements differing only in list length group together
+IN_LIST_RE = re.compile(r'\((?:%s, )*%s\)')
+
+
+class QueryStats:
+    """Database execute wrapper timing every query and grouping them by statement"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.time += elapsed
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def top_repeated(self, limit):
+        """The statements run more than once, most frequent first"""
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, (count, elapsed) in self.statements.items():
+            statement = grouped[IN_LIST_RE.sub('(...)', sql)]
+            statement[0] += count
+            statement[1] += elapsed
+        repeated = sorted(
+            (item for item in grouped.items() if item[1][0] > 1),
+            key=lambda item: (-item[1][0], -item[1][1])
+        )
+        return [
+            {'sql': sql, 'count': count, 'ms': round(elapsed * 1000, 2)}
+            for sql, (count, elapsed) in repeated[:limit]
+        ]
+
+
+@contextmanager
+def timed_serialization(request):
+    """
+    Count the time spent in the block, less the SQL it runs, as the
+    request's serialization time, and the queries it runs as its
+    serialization queries, which is where lazy loads show up.
+    """
+    request = getattr(request, '_request', request)
+    stats = getattr(request, 'logistics_query_stats', None)
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    sql_time, sql_count = stats.time, stats.count
+    try:
+        yield
+    finally:
+        request.logistics_serialize_time += time.perf_counter() - start - (stats.time - sql_time)
+        request.logistics_serialize_queries += stats.count - sql_count
+
+
+def view_name(view_func, method):
+    """Dotted name of a view, with the viewset action for DRF viewsets"""
+    cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    name = f'{cls.__module__}.{cls.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        name = f'{name}.{actions.get(method.lower(), method.lower())}'
+    return name
+
+
+class RequestTimingMiddleware:
+    """
+    Measure every request: number and duration of SQL queries, time spent
+    serializing (see timed_serialization) and rendering the response, and
+    total time.
+
+    The numbers are returned in a Server-Timing header. Requests slower than
+    SLOW_REQUEST_MS or running SLOW_REQUEST_QUERIES or more queries are
+    written to the `logistics.slow_requests` log as JSON, with the view and
+    the most repeated SQL statements, which is how an N+1 shows up.
+
+    Streamed responses (the exports) run most of their SQL while the body
+    is sent, so they are measured until the last chunk. Their headers go
+    out first, so Server-Timing only covers the time until streaming
+    started; the slow request log and /metrics have the full numbers.
+
+    Latencies and status codes per view also go to the /metrics registry;
+    requests that match no URL are counted under the view `unmatched`.
+    """
+
+    def __init__(self, get_response):
+        if not app_settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        stats = QueryStats()
+        request.logistics_query_stats = stats
+        request.logistics_serialize_time = 0.0
+        request.logistics_serialize_queries = 0
+        request.logistics_render_time = 0.0
+
+        wrappers = ExitStack()
+        for connection in connections.all():
+            wrappers.enter_context(connection.execute_wrapper(stats))
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            wrappers.close()
+            raise
+
+        total = time.perf_counter() - start
+        serialize = request.logistics_serialize_time
+        render = request.logistics_render_time
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={stats.time * 1000:.2f};desc="{stats.count} queries"',
+            f'serialize;dur={serialize * 1000:.2f};desc="{request.logistics_serialize_queries} queries"',
+            f'render;dur={render * 1000:.2f}',
+            f'app;dur={max(total - stats.time - serialize - render, 0) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        view = getattr(request, 'logistics_view_name', None) or 'unmatched'
+
+        def finish():
+            wrappers.close()
+            total = time.perf_counter() - start
+            self.record_metrics(request, response, view, total)
+            self.log_slow_request(request, response, view, total, stats)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(response.streaming_content, finish)
+        else:
+            finish()
+        return response
+
+    def stream(self, chunks, finish):
+        """Yield a streamed response body, then finish measuring the request"""
+        try:
+            yield from chunks
+        finally:
+            finish()
+
+    def record_metrics(self, request, response, view, total):
+        metrics.observe('logistics_request_duration_seconds', total, view=view, method=request.method)
+        metrics.inc('logistics_requests_total', view=view, method=request.method, status=response.status_code)
+        if response.status_code >= 500:
+            metrics.inc('logistics_request_errors_total', view=view, status=response.status_code)
+
+    def log_slow_request(self, request, response, view, total, stats):
+        if total * 1000 < app_settings.SLOW_REQUEST_MS and stats.count < app_settings.SLOW_REQUEST_QUERIES:
+            return
+        logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': view,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(stats.time * 1000, 2),
+            'sql_queries': stats.count,
+            'serialize_ms': round(request.logistics_serialize_time * 1000, 2),
+            'serialize_queries': request.logistics_serialize_queries,
+            'render_ms': round(request.logistics_render_time * 1000, 2),
+            'repeated_sql': stats.top_repeated(app_settings.SLOW_REQUEST_TOP_STATEMENTS),
+        }))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.logistics_view_name = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # Called right before DRF and template responses are rendered
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.logistics_render_time = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Run a request under cProfile when a staff user asks for it with an
+    `X-Profile: 1` header or `?profile=1`. Only staff logged in with a
+    session count, see profiling.profile_requested.
+
+    At most PROFILE_RATE_LIMIT requests are profiled per PROFILE_RATE_WINDOW
+    seconds; the profile id (or `rate-limited`) is returned in the X-Profile
+    response header. Streamed exports are profiled until their last chunk.
+    Must come after AuthenticationMiddleware. See the `profiles` command.
+    """
+
+    def __init__(self, get_response):
+        if not app_settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_requested(request):
+            return self.get_response(request)
+        if not acquire_slot():
+            response = self.get_response(request)
+            response['X-Profile'] = 'rate-limited'
+            return response
+
+        profile = RequestProfile(request)
+        response = profile.run(self.get_response, request)
+        profile.meta['view'] = getattr(request, 'logistics_view_name', None)
+        profile.meta['status'] = response.status_code
+        response['X-Profile'] = profile.id
+        if response.streaming:
+            response.streaming_content = profile.stream(response.streaming_content)
+        else:
+            profile.save()
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0002_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at', 'id'], name='logistics_booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['ship_arrival_date', 'id'], name='logistics_booking_arrival_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['ship_departure_date', 'id'], name='logistics_booking_depart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['loading_port'], name='logistics_booking_loading_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['discharge_port'], name='logistics_booking_dischg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['booking', 'created_at'], name='logistics_vehicle_booking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['created_at', 'id'], name='logistics_vehicle_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['make'], name='logistics_vehicle_make_idx'),
+        ),
+    ]
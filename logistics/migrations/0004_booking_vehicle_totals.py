@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:26
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_vehicle_totals(apps, schema_editor):
+    Booking = apps.get_model('logistics', 'Booking')
+    Vehicle = apps.get_model('logistics', 'Vehicle')
+
+    vehicles = Vehicle.objects.filter(booking=OuterRef('pk')).order_by().values('booking')
+    Booking.objects.update(
+        vehicle_count=Coalesce(Subquery(vehicles.annotate(count=Count('id')).values('count')), 0),
+        total_weight=Coalesce(
+            Subquery(vehicles.annotate(weight=Sum('weight')).values('weight')),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0003_add_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='total_weight',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Total weight of the booked vehicles in kilograms', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='vehicle_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_vehicle_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:12
+
+from django.db import migrations
+
+SEARCH_INDEXES = {
+    'logistics_vehicle': ('make', 'model'),
+    'logistics_booking': ('loading_port', 'discharge_port'),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    # FTS5 is SQLite only; other databases fall back to icontains lookups
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in SEARCH_INDEXES.items():
+        fts = f'{table}_fts'
+        names = ', '.join(columns)
+        new = ', '.join(f'new.{column}' for column in columns)
+        old = ', '.join(f'old.{column}' for column in columns)
+        insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+        delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id')"
+        )
+        schema_editor.execute(f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END")
+        schema_editor.execute(f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END")
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END"
+        )
+        # Index the rows that already exist
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_INDEXES:
+        fts = f'{table}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0004_booking_vehicle_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,14 +1,25 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
-import random
-import string
+from django.utils import timezone
 
 
 from .app_settings import (
     VIN_VALIDATOR_REGEX, BOOKING_NUMBER_REGEX,
     DEFAULT_VEHICLE_MAKE, DEFAULT_VEHICLE_MODEL, DEFAULT_VEHICLE_WEIGHT
 )
+from .vins import generate_vins
+
+
+def validate_schedule(departure, arrival):
+    """Check that a ship departs before it arrives, when both dates are known"""
+    if departure and arrival and departure > arrival:
+        raise ValidationError("Ship departure date must be before arrival date")
+
+
+# Denormalized Booking columns that are only ever changed with F() deltas
+COUNTER_FIELDS = ('vehicle_count', 'total_weight')
+
 
 class Booking(models.Model):
     booking_number = models.CharField(
@@ -26,19 +37,52 @@ class Booking(models.Model):
     discharge_port = models.CharField(max_length=100)
     ship_arrival_date = models.DateTimeField()
     ship_departure_date = models.DateTimeField()
+    # Denormalized vehicle totals, maintained by logistics.counters
+    vehicle_count = models.PositiveIntegerField(default=0, editable=False)
+    total_weight = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Total weight of the booked vehicles in kilograms"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']  # Order by creation date, newest first
+        indexes = [
+            # Default ordering and keyset pagination
+            models.Index(fields=['created_at', 'id'], name='logistics_booking_created_idx'),
+            # Old vehicle purge and date range lookups
+            models.Index(fields=['ship_arrival_date', 'id'], name='logistics_booking_arrival_idx'),
+            models.Index(fields=['ship_departure_date', 'id'], name='logistics_booking_depart_idx'),
+            # Admin port filters
+            models.Index(fields=['loading_port'], name='logistics_booking_loading_idx'),
+            models.Index(fields=['discharge_port'], name='logistics_booking_dischg_idx'),
+        ]
 
     def __str__(self):
         return f"Booking {self.booking_number}"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the booking without writing vehicle_count and total_weight.
+
+        The totals only change through F() expression deltas (see
+        logistics.counters); writing back the values loaded with this
+        instance would undo vehicle changes made since it was read.
+        """
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = [name for name in update_fields if name not in COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
     def clean(self):
-        # Validate departure date is before arrival date
-        if self.ship_departure_date and self.ship_arrival_date and self.ship_departure_date > self.ship_arrival_date:
-            raise ValidationError("Ship departure date must be before arrival date")
+        validate_schedule(self.ship_departure_date, self.ship_arrival_date)
 
     def addVehicleToBooking(self, vehicle):
         """
@@ -77,10 +121,29 @@ class Vehicle(models.Model):
 
     class Meta:
         ordering = ['-created_at']  # Order by creation date, newest first
+        indexes = [
+            # Vehicles of a booking in default order
+            models.Index(fields=['booking', 'created_at'], name='logistics_vehicle_booking_idx'),
+            # Default ordering and keyset pagination
+            models.Index(fields=['created_at', 'id'], name='logistics_vehicle_created_idx'),
+            # Admin make filter
+            models.Index(fields=['make'], name='logistics_vehicle_make_idx'),
+        ]
 
     def __str__(self):
         return f"{self.make} {self.model} ({self.vin})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this vehicle contributes to its booking's totals
+        instance._counted = (
+            (instance.booking_id, instance.weight)
+            if 'booking_id' in instance.__dict__ and 'weight' in instance.__dict__
+            else None
+        )
+        return instance
+
     @classmethod
     def createVehicle(cls, vin, make, model, weight, booking=None):
         """
@@ -102,9 +165,10 @@ class Vehicle(models.Model):
         """
         Create a vehicle with random VIN and default values
         """
-        # Generate a valid random VIN (17 characters)
-        valid_chars = string.digits + ''.join([c for c in string.ascii_uppercase if c not in 'IOQ'])
-        random_vin = ''.join(random.choice(valid_chars) for _ in range(17))
+        # Generate a random VIN with a valid check digit that is not taken yet
+        random_vin = generate_vins(1)[0]
+        while cls.objects.filter(vin=random_vin).exists():
+            random_vin = generate_vins(1)[0]
 
         # Use default values from settings
         default_make = DEFAULT_VEHICLE_MAKE
@@ -136,4 +200,120 @@ class Vehicle(models.Model):
                 raise ValueError(f"Booking with id {booking_id} does not exist")
 
         self.save()
-        return self
\ No newline at end of file
+        return self
+
+    # Filters accepted by bulkAddToBooking, mapped to queryset lookups
+    BULK_FILTERS = {
+        'booking': 'booking_id',
+        'make': 'make',
+        'model': 'model',
+    }
+
+    @classmethod
+    def bulkAddToBooking(cls, booking_id, vehicle_ids=None, vins=None, filters=None):
+        """
+        Associate many vehicles with a booking in a single UPDATE.
+        If booking_id is 0, disassociate them from any booking.
+
+        Vehicles are selected by id, by VIN or by a filter dict (see
+        BULK_FILTERS, where a booking of 0 selects unassigned vehicles).
+        Returns the number of updated vehicles and the ids or VINs that
+        were not found.
+        """
+        if booking_id != 0 and not Booking.objects.filter(pk=booking_id).exists():
+            raise ValueError(f"Booking with id {booking_id} does not exist")
+
+        not_found = []
+        if vehicle_ids is not None:
+            found = set(cls.objects.filter(pk__in=vehicle_ids).values_list('pk', flat=True))
+            not_found = [pk for pk in vehicle_ids if pk not in found]
+            queryset = cls.objects.filter(pk__in=found)
+        elif vins is not None:
+            found = dict(cls.objects.filter(vin__in=vins).values_list('vin', 'pk'))
+            not_found = [vin for vin in vins if vin not in found]
+            queryset = cls.objects.filter(pk__in=found.values())
+        elif filters:
+            lookups = {}
+            for key, value in filters.items():
+                if key not in cls.BULK_FILTERS:
+                    raise ValueError(f"Unsupported filter: {key}")
+                if key == 'booking' and not value:
+                    value = None
+                lookups[cls.BULK_FILTERS[key]] = value
+            queryset = cls.objects.filter(**lookups)
+        else:
+            raise ValueError("Provide vehicle ids, VINs or a filter")
+
+        from .cache import bump_version
+        from .counters import CounterDeltas, apply_grouped
+
+        with transaction.atomic():
+            deltas = CounterDeltas()
+            if vehicle_ids is None and vins is None:
+                # Any number of vehicles may match, so take them off their bookings in SQL
+                apply_grouped(queryset, sign=-1)
+            else:
+                deltas.add_grouped(queryset, sign=-1)
+            weight = queryset.aggregate(weight=models.Sum('weight'))['weight']
+            updated = queryset.update(
+                booking_id=booking_id or None,
+                updated_at=timezone.now()
+            )
+            deltas.add(booking_id or None, updated, weight)
+            deltas.apply()
+            bump_version('booking', 'vehicle')
+        return updated, not_found
+
+
+class Job(models.Model):
+    """
+    A long-running operation queued from the API and executed by the
+    run_jobs worker command.
+    """
+    KIND_PURGE_OLD_VEHICLES = 'purge_old_vehicles'
+    KIND_IMPORT_VEHICLES = 'import_vehicles'
+    KIND_CHOICES = [
+        (KIND_PURGE_OLD_VEHICLES, 'Purge old vehicles'),
+        (KIND_IMPORT_VEHICLES, 'Import vehicles'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    params = models.JSONField(default=dict, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']  # Order by creation date, newest first
+        indexes = [
+            models.Index(fields=['status', 'id'], name='logistics_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.kind}, {self.status})"
+
+    def reportProgress(self, rows_processed):
+        """
+        Record progress without touching the other columns.
+        """
+        self.rows_processed = rows_processed
+        Job.objects.filter(pk=self.pk).update(
+            rows_processed=rows_processed,
+            updated_at=timezone.now()
+        )
@@ -0,0 +1,115 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .app_settings import MAX_PAGE_SIZE
+
+
+class LogisticsPagination(PageNumberPagination):
+    """
+    Page number pagination with opt-in keyset (cursor) pagination.
+
+    By default pages are addressed with `?page=` and sized with `?limit=`
+    up to MAX_PAGE_SIZE. Clients that pass `?pagination=cursor` (or follow
+    a `?cursor=` link) get keyset pagination instead: rows are ordered on
+    (created_at, id), newest first, and each page is fetched with a range
+    condition on the last row seen, so there is no COUNT(*) and no OFFSET
+    scan and deep pages cost the same as the first.
+    """
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_cursor(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_cursor(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # Fetch one extra row to find out whether there is a following page
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.cursor_link(self.page[0], reverse=True)
+
+    def cursor_link(self, instance, reverse):
+        token = f"{instance.created_at.isoformat()}|{instance.pk}|{int(reverse)}"
+        cursor = b64encode(token.encode()).decode()
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Return the ((created_at, id), reverse) position encoded in the cursor"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            created_at, pk, reverse = b64decode(cursor.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse == '1'
@@ -0,0 +1,150 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from datetime import datetime
+
+from django.utils import timezone
+
+from . import app_settings
+from .cache import get_cache
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def is_true(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def profile_requested(request):
+    """
+    Whether a staff user asked for this request to be profiled.
+
+    The user is Django's request.user, set by AuthenticationMiddleware from
+    the session; clients authenticating per request (e.g. DRF basic or
+    token auth) are only known inside the view and cannot profile.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return False
+    return is_true(request.META.get(PROFILE_HEADER)) or is_true(request.GET.get(app_settings.PROFILE_PARAM))
+
+
+def acquire_slot():
+    """
+    Take one of the PROFILE_RATE_LIMIT profiles allowed per
+    PROFILE_RATE_WINDOW seconds, counted in the cache across processes
+    """
+    window = app_settings.PROFILE_RATE_WINDOW
+    key = f'logistics:profiling:{int(time.time() // window)}'
+    cache = get_cache()
+    if cache.add(key, 1, timeout=window * 2):
+        return app_settings.PROFILE_RATE_LIMIT >= 1
+    try:
+        return cache.incr(key) <= app_settings.PROFILE_RATE_LIMIT
+    except ValueError:
+        return False
+
+
+class RequestProfile:
+    """
+    A cProfile run over one request, including a streamed response body.
+
+    The stats are saved to PROFILE_DIR as `<id>.prof` (pstats format, which
+    snakeviz, gprof2dot and flameprof read) with a `<id>.json` summary next
+    to it. Only the newest PROFILE_KEEP profiles are kept.
+    """
+
+    def __init__(self, request, directory=None):
+        self.directory = directory or app_settings.PROFILE_DIR
+        self.id = f'{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}'
+        self.profiler = cProfile.Profile()
+        self.meta = {
+            'id': self.id,
+            'created_at': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.get_username(),
+            'view': None,
+            'status': None,
+            'duration_ms': 0.0,
+            'complete': True,
+        }
+        self.elapsed = 0.0
+
+    def run(self, func, *args):
+        """Call func under the profiler"""
+        start = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Python 3.12+ runs one profiler per process; let the other one finish
+            self.meta['complete'] = False
+            try:
+                return func(*args)
+            finally:
+                self.elapsed += time.perf_counter() - start
+        try:
+            return func(*args)
+        finally:
+            self.profiler.disable()
+            self.elapsed += time.perf_counter() - start
+
+    def stream(self, chunks):
+        """Yield from a streamed response body, profiling each chunk, then save"""
+        chunks = iter(chunks)
+        try:
+            while True:
+                try:
+                    chunk = self.run(next, chunks)
+                except StopIteration:
+                    break
+                yield chunk
+        finally:
+            self.save()
+
+    def save(self):
+        self.meta['duration_ms'] = round(self.elapsed * 1000, 2)
+        os.makedirs(self.directory, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(self.directory, f'{self.id}.prof'))
+        with open(os.path.join(self.directory, f'{self.id}.json'), 'w') as f:
+            json.dump(self.meta, f)
+        rotate(self.directory, app_settings.PROFILE_KEEP)
+
+
+def list_profiles(directory=None):
+    """Return the summaries of the saved profiles, newest first"""
+    directory = directory or app_settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def rotate(directory, keep):
+    """Delete all but the newest `keep` profiles"""
+    for meta in list_profiles(directory)[keep:]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(directory, f'{meta["id"]}{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def profile_stats(profile_id, sort='cumulative', limit=25, directory=None):
+    """Return the pstats report of a saved profile as text"""
+    directory = directory or app_settings.PROFILE_DIR
+    output = io.StringIO()
+    stats = pstats.Stats(os.path.join(directory, f'{profile_id}.prof'), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
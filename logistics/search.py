@@ -0,0 +1,131 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+
+# Text columns of each table mirrored into an SQLite FTS5 index named <table>_fts
+SEARCH_INDEXES = {
+    'logistics_vehicle': ('make', 'model'),
+    'logistics_booking': ('loading_port', 'discharge_port'),
+}
+
+IDENTIFIER_RE = re.compile(r'^[A-Za-z0-9-]+$')
+TOKEN_RE = re.compile(r'\w+')
+
+_fts_tables = {}
+
+
+def trigger_sql(table):
+    """Statements keeping the FTS index of a table in sync on every write"""
+    fts = f'{table}_fts'
+    columns = SEARCH_INDEXES[table]
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def fts_available(using=DEFAULT_DB_ALIAS, table='logistics_vehicle'):
+    """Whether the FTS index of a table exists on the given database"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (connection.settings_dict['NAME'], table)
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [f'{table}_fts']
+            )
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def ensure_search_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Recreate missing FTS triggers after migrations.
+
+    SQLite drops the triggers of a table when a migration rebuilds it, which
+    would silently stop the index from following writes.
+    """
+    _fts_tables.clear()
+    for table in SEARCH_INDEXES:
+        if fts_available(using, table):
+            with connections[using].cursor() as cursor:
+                for statement in trigger_sql(table):
+                    cursor.execute(statement)
+
+
+def prefix_filter(field, prefix):
+    """A range condition matching `prefix` that the field's index can serve"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def text_search(queryset, term, fields):
+    """
+    Match every word of `term` as a prefix of a word in `fields`.
+
+    Uses the table's FTS index ranked by relevance where it exists and
+    falls back to icontains lookups elsewhere.
+    """
+    tokens = TOKEN_RE.findall(term)
+    if not tokens:
+        return queryset.none()
+
+    table = queryset.model._meta.db_table
+    if not fts_available(queryset.db, table):
+        return queryset.filter(reduce(and_, (
+            reduce(or_, (Q(**{f'{field}__icontains': token}) for field in fields))
+            for token in tokens
+        )))
+
+    fts = f'{table}_fts'
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    return queryset.extra(
+        tables=[fts],
+        where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'{fts}.rank'},
+        order_by=['search_rank'],
+    )
+
+
+def search(queryset, term, identifier, fields):
+    """
+    Search a queryset by identifier prefix, then by text.
+
+    A single code-like word is first looked up as a prefix of `identifier`
+    with an index range scan; when nothing matches, or the term is free
+    text, the text fields are searched instead.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    if IDENTIFIER_RE.match(term):
+        matches = queryset.filter(reduce(or_, (
+            prefix_filter(identifier, prefix) for prefix in {term, term.upper()}
+        )))
+        if matches.exists():
+            return matches.order_by(identifier)
+
+    return text_search(queryset, term, fields)
+
+
+def search_vehicles(queryset, term):
+    """Search vehicles by VIN prefix or by make and model"""
+    return search(queryset, term, 'vin', SEARCH_INDEXES['logistics_vehicle'])
+
+
+def search_bookings(queryset, term):
+    """Search bookings by booking number prefix or by port"""
+    return search(queryset, term, 'booking_number', SEARCH_INDEXES['logistics_booking'])
@@ -0,0 +1,169 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_version
+from .counters import recount_bookings
+from .models import Booking, Vehicle
+from .vins import VIN_CHARS, generate_vins
+
+# Port: relative share of sailings
+LOADING_PORTS = {
+    'Zeebrugge': 14, 'Antwerp': 12, 'Bremerhaven': 12, 'Southampton': 8, 'Emden': 6,
+    'Yokohama': 10, 'Nagoya': 8, 'Ulsan': 8, 'Shanghai': 10, 'Baltimore': 6,
+}
+DISCHARGE_PORTS = {
+    'Jeddah': 10, 'Dubai': 10, 'Durban': 8, 'Lagos': 8, 'Singapore': 8, 'Sydney': 8,
+    'Baltimore': 8, 'Veracruz': 6, 'Santos': 6, 'Antwerp': 8, 'Bremerhaven': 6,
+}
+
+# Make: (share of vehicles, manufacturer codes, {model: typical weight in kg})
+MAKES = {
+    'Toyota': (18, ('JTD', 'JTE', 'JTN'), {'Corolla': 1310, 'RAV4': 1620, 'Land Cruiser': 2580}),
+    'Volkswagen': (14, ('WVW', 'WVG'), {'Golf': 1280, 'Tiguan': 1590, 'Passat': 1480}),
+    'Hyundai': (10, ('KMH',), {'i30': 1270, 'Tucson': 1560, 'Ioniq 5': 1950}),
+    'Ford': (10, ('1FA', '1FT', 'WF0'), {'Focus': 1300, 'Ranger': 2100, 'Mustang': 1720}),
+    'BMW': (9, ('WBA', 'WBS'), {'320i': 1520, 'X5': 2190, 'i4': 2050}),
+    'Mercedes-Benz': (9, ('WDD', 'W1K'), {'C200': 1560, 'GLE 350': 2150, 'Sprinter': 2500}),
+    'Honda': (8, ('1HG', 'JHM'), {'Civic': 1290, 'CR-V': 1600, 'Accord': 1500}),
+    'Tesla': (7, ('5YJ', '7SA'), {'Model 3': 1760, 'Model Y': 1980, 'Model S': 2160}),
+    'Kia': (7, ('KNA',), {'Sportage': 1550, 'EV6': 1990, 'Picanto': 940}),
+    'Volvo': (8, ('YV1', 'YV4'), {'XC60': 1920, 'XC90': 2100, 'V60': 1750}),
+}
+
+BOOKING_NUMBER_PREFIX = 'BK-'
+
+# Departures are spread over this window around today
+DAYS_BACK = 540
+DAYS_AHEAD = 180
+
+
+def unique_values(generate, count, seen, model, field):
+    """
+    Generate `count` values that are neither in `seen` nor in the database.
+
+    Candidates are checked against the in-memory set first and then with
+    one IN query per round; taken ones are simply generated again.
+    """
+    values = []
+    while len(values) < count:
+        candidates = []
+        for value in generate(count - len(values)):
+            if value not in seen:
+                seen.add(value)
+                candidates.append(value)
+        taken = set(model.objects.filter(**{f'{field}__in': candidates}).values_list(field, flat=True))
+        values.extend(value for value in candidates if value not in taken)
+    return values
+
+
+class Seeder:
+    """
+    Generate bookings and vehicles with realistic ports, schedules, makes
+    and weights, and insert them with bulk_create in batches.
+
+    The same `seed` on the same database produces the same data.
+    """
+
+    def __init__(self, seed=None, batch_size=5000, unassigned=0.05, progress=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.unassigned = unassigned
+        self.progress = progress
+        self.today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.seen_vins = set()
+        self.seen_numbers = set()
+        self.make_names = list(MAKES)
+        self.make_shares = [share for share, _, _ in MAKES.values()]
+
+    def booking_numbers(self, count):
+        chars = self.rng.choices(VIN_CHARS, k=count * 8)
+        return [BOOKING_NUMBER_PREFIX + ''.join(chars[i * 8:(i + 1) * 8]) for i in range(count)]
+
+    def make_bookings(self, count):
+        rng = self.rng
+        numbers = unique_values(self.booking_numbers, count, self.seen_numbers, Booking, 'booking_number')
+        loading = rng.choices(list(LOADING_PORTS), weights=list(LOADING_PORTS.values()), k=count)
+        discharge = rng.choices(list(DISCHARGE_PORTS), weights=list(DISCHARGE_PORTS.values()), k=count)
+
+        bookings = []
+        for number, loading_port, discharge_port in zip(numbers, loading, discharge):
+            while discharge_port == loading_port:
+                discharge_port = rng.choice(list(DISCHARGE_PORTS))
+            departure = self.today + timedelta(
+                days=rng.randint(-DAYS_BACK, DAYS_AHEAD), hours=rng.randint(0, 23)
+            )
+            # Deep sea transits of roughly three weeks, rarely under five days
+            transit = max(5, min(60, rng.gauss(24, 8)))
+            bookings.append(Booking(
+                booking_number=number,
+                loading_port=loading_port,
+                discharge_port=discharge_port,
+                ship_departure_date=departure,
+                ship_arrival_date=departure + timedelta(days=transit),
+            ))
+        return bookings
+
+    def make_vehicles(self, count, booking_ids):
+        rng = self.rng
+        makes = rng.choices(self.make_names, weights=self.make_shares, k=count)
+
+        vehicles = []
+        for make in makes:
+            models = MAKES[make][2]
+            model, weight = rng.choice(list(models.items()))
+            vehicles.append(Vehicle(
+                vin=None,
+                make=make,
+                model=model,
+                weight=Decimal(round(weight * rng.gauss(1, 0.04), 2)).quantize(Decimal('0.01')),
+                booking_id=(rng.choice(booking_ids)
+                            if booking_ids and rng.random() >= self.unassigned else None),
+            ))
+
+        # Draw VINs per make so each carries its manufacturer code
+        by_make = {}
+        for vehicle in vehicles:
+            by_make.setdefault(vehicle.make, []).append(vehicle)
+        for make, group in by_make.items():
+            codes = MAKES[make][1]
+            vins = unique_values(
+                lambda n: generate_vins(n, rng, codes), len(group), self.seen_vins, Vehicle, 'vin'
+            )
+            for vehicle, vin in zip(group, vins):
+                vehicle.vin = vin
+        return vehicles
+
+    def batches(self, total):
+        while total > 0:
+            size = min(self.batch_size, total)
+            yield size
+            total -= size
+
+    def run(self, bookings=0, vehicles=0):
+        """Create the bookings, then the vehicles, and return both counts"""
+        booking_ids = []
+        for size in self.batches(bookings):
+            with transaction.atomic():
+                created = Booking.objects.bulk_create(self.make_bookings(size))
+            booking_ids.extend(booking.pk for booking in created)
+            if self.progress is not None:
+                self.progress('bookings', len(booking_ids))
+
+        created_vehicles = 0
+        for size in self.batches(vehicles):
+            with transaction.atomic():
+                Vehicle.objects.bulk_create(self.make_vehicles(size, booking_ids))
+            created_vehicles += size
+            if self.progress is not None:
+                self.progress('vehicles', created_vehicles)
+
+        # bulk_create skips the signals; vehicles only go to the new bookings,
+        # so recounting their id range with one UPDATE sets every total
+        if booking_ids:
+            recount_bookings(Booking.objects.filter(pk__gte=min(booking_ids), pk__lte=max(booking_ids)))
+        bump_version('booking', 'vehicle')
+        return len(booking_ids), created_vehicles
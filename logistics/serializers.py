@@ -1,33 +1,129 @@
 from rest_framework import serializers
-from .models import Booking, Vehicle
+from .middleware import timed_serialization
+from .models import Booking, Vehicle, Job, validate_schedule
 
 
-class VehicleSerializer(serializers.ModelSerializer):
+def get_field_params(request):
+    """
+    Return the field names requested with ?fields= (None when absent) and
+    the set of names excluded with ?omit=
+    """
+    def split(name):
+        value = request.query_params.get(name, '')
+        return {field.strip() for field in value.split(',') if field.strip()}
+
+    return split('fields') or None, split('omit')
+
+
+class SparseFieldsMixin:
+    """
+    Narrow the output of GET requests to the fields named in ?fields= and
+    drop those named in ?omit=. Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+
+        fields, omit = get_field_params(request)
+        for name in list(self.fields):
+            if name in omit or (fields is not None and name not in fields):
+                self.fields.pop(name)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed_serialization(self.context.get('request')):
+            return super().data
+
+
+class TimedDataMixin:
+    """
+    Report the time spent building .data as serialization in the request
+    timing. Set Meta.list_serializer_class = TimedListSerializer to cover
+    many=True as well.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization(self.context.get('request')):
+            return super().data
+
+
+class VehicleSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Vehicle
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'vin', 'make', 'model', 'weight', 'booking', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
 
-class BookingSerializer(serializers.ModelSerializer):
-    vehicles = VehicleSerializer(many=True, read_only=True)
-    vehicle_count = serializers.SerializerMethodField()
+class BookingListSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Slim booking representation with aggregated vehicle figures instead of
+    the nested vehicle list.
+    """
 
     class Meta:
         model = Booking
         fields = ['id', 'booking_number', 'loading_port', 'discharge_port',
-                  'ship_arrival_date', 'ship_departure_date', 'vehicles',
-                  'vehicle_count', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
-
-    def get_vehicle_count(self, obj):
-        return obj.vehicles.count()
+                  'ship_arrival_date', 'ship_departure_date',
+                  'vehicle_count', 'total_weight', 'created_at', 'updated_at']
+        read_only_fields = ['vehicle_count', 'total_weight', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
 
     def validate(self, data):
         """
         Check that ship_departure_date is before ship_arrival_date
         """
-        if data.get('ship_departure_date') and data.get('ship_arrival_date'):
-            if data['ship_departure_date'] > data['ship_arrival_date']:
-                raise serializers.ValidationError("Ship departure date must be before arrival date")
-        return data
\ No newline at end of file
+        validate_schedule(data.get('ship_departure_date'), data.get('ship_arrival_date'))
+        return data
+
+
+class BookingSerializer(BookingListSerializer):
+    vehicles = VehicleSerializer(many=True, read_only=True)
+
+    class Meta(BookingListSerializer.Meta):
+        fields = ['id', 'booking_number', 'loading_port', 'discharge_port',
+                  'ship_arrival_date', 'ship_departure_date', 'vehicles',
+                  'vehicle_count', 'total_weight', 'created_at', 'updated_at']
+
+
+class BookingUpsertSerializer(BookingListSerializer):
+    """
+    One booking of a bulk upsert. The booking number is the upsert key, so
+    it is checked for its format here and for existence by the upsert.
+    """
+
+    class Meta(BookingListSerializer.Meta):
+        fields = ['booking_number', 'loading_port', 'discharge_port',
+                  'ship_arrival_date', 'ship_departure_date']
+        extra_kwargs = {
+            'booking_number': {'validators': Booking._meta.get_field('booking_number').validators},
+        }
+
+
+class VehicleUpsertSerializer(serializers.ModelSerializer):
+    """
+    One vehicle of a bulk upsert. The VIN is the upsert key, so it is only
+    checked for its format; the booking is referred to by number.
+    """
+    booking_number = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    class Meta:
+        model = Vehicle
+        fields = ['vin', 'make', 'model', 'weight', 'booking_number']
+        extra_kwargs = {
+            'vin': {'validators': Vehicle._meta.get_field('vin').validators},
+        }
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'rows_processed', 'result', 'error',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
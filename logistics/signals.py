@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_version
+from .counters import CounterDeltas
+from .models import Booking, Vehicle
+
+
+@receiver(pre_save, sender=Vehicle)
+@receiver(pre_delete, sender=Vehicle)
+def remember_counted_state(sender, instance, raw=False, **kwargs):
+    """
+    Make sure an existing vehicle knows what it contributed to its booking's
+    totals before a save or delete changes it, reading the row if it was
+    not loaded from the database with both fields.
+    """
+    if raw or instance._state.adding or getattr(instance, '_counted', None) is not None:
+        return
+    instance._counted = (
+        Vehicle.objects.filter(pk=instance.pk).values_list('booking_id', 'weight').first()
+    )
+
+
+COUNTED_FIELDS = {'booking', 'booking_id', 'weight'}
+
+
+@receiver(post_save, sender=Vehicle)
+def update_booking_totals_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not COUNTED_FIELDS & set(update_fields)):
+        return
+    deltas = CounterDeltas()
+    previous = None if created else getattr(instance, '_counted', None)
+    if previous is not None:
+        deltas.add(previous[0], -1, -previous[1])
+    deltas.add(instance.booking_id, 1, instance.weight)
+    deltas.apply()
+    instance._counted = (instance.booking_id, Decimal(str(instance.weight)))
+
+
+@receiver(post_delete, sender=Vehicle)
+def update_booking_totals_on_delete(sender, instance, **kwargs):
+    # The row is gone, so use what pre_delete read rather than deferred fields
+    previous = getattr(instance, '_counted', None)
+    if previous is not None:
+        deltas = CounterDeltas()
+        deltas.add(previous[0], -1, -previous[1])
+        deltas.apply()
+    instance._counted = None
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=Booking)
+def invalidate_cached_responses(sender, **kwargs):
+    # Vehicle writes change booking totals, booking deletes unassign vehicles
+    bump_version('booking', 'vehicle')
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_cached_bookings(sender, **kwargs):
+    bump_version('booking')
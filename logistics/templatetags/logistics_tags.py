@@ -1,32 +1,58 @@
 from django import template
+from django.core.paginator import Paginator
 from logistics.models import Booking, Vehicle
-from logistics.app_settings import OLD_VEHICLES_DAYS
-from django.utils import timezone
-from datetime import timedelta
+from logistics.app_settings import OLD_VEHICLES_DAYS, MAX_PAGE_SIZE, TEMPLATE_PAGE_SIZE
+from logistics.cache import get_version
+from logistics.maintenance import get_old_vehicles as old_vehicles_queryset
 
 register = template.Library()
 
+# Columns rendered by the list templates; nothing else is loaded
+BOOKING_COLUMNS = ('booking_number', 'loading_port', 'discharge_port',
+                   'ship_departure_date', 'ship_arrival_date', 'vehicle_count')
+VEHICLE_COLUMNS = ('vin', 'make', 'model', 'weight', 'booking__booking_number')
+
 @register.simple_tag
 def get_bookings():
-    """Return all bookings ordered by departure date"""
-    return Booking.objects.all().order_by('ship_departure_date')
+    """Return bookings ordered by departure date"""
+    return Booking.objects.only(*BOOKING_COLUMNS).order_by('ship_departure_date', 'id')
 
 @register.simple_tag
 def get_vehicles(booking_id=None):
-    """Return vehicles, optionally filtered by booking"""
-    if booking_id:
-        return Vehicle.objects.filter(booking_id=booking_id)
-    return Vehicle.objects.all()
+    """Return vehicles with their booking number, optionally filtered by booking"""
+    vehicles = Vehicle.objects.select_related('booking').only(*VEHICLE_COLUMNS).order_by('-created_at', '-id')
+    if booking_id and str(booking_id).isdigit():
+        return vehicles.filter(booking_id=booking_id)
+    return vehicles
 
 @register.simple_tag
 def get_vehicle_count(booking_id=None):
     """Return the count of vehicles, optionally for a specific booking"""
     if booking_id:
-        return Vehicle.objects.filter(booking_id=booking_id).count()
+        return Booking.objects.filter(pk=booking_id).values_list('vehicle_count', flat=True).first() or 0
     return Vehicle.objects.count()
 
 @register.simple_tag
-def get_old_vehicles():
+def get_old_vehicles(days=OLD_VEHICLES_DAYS):
     """Return vehicles with bookings older than the configured threshold"""
-    cutoff_date = timezone.now() - timedelta(days=OLD_VEHICLES_DAYS)
-    return Vehicle.objects.filter(booking__ship_arrival_date__lt=cutoff_date)
+    return old_vehicles_queryset(days).select_related('booking').only(*VEHICLE_COLUMNS).order_by('pk')
+
+@register.simple_tag(takes_context=True)
+def paginate(context, queryset, per_page=None, param='page'):
+    """Return the page of a queryset requested with ?page= (or `param`)"""
+    request = context.get('request')
+    number = request.GET.get(param) if request is not None else None
+    per_page = min(int(per_page or TEMPLATE_PAGE_SIZE), MAX_PAGE_SIZE)
+    return Paginator(queryset, per_page).get_page(number)
+
+@register.simple_tag
+def cache_version(*labels):
+    """Return the cache versions of model labels, to key {% cache %} fragments on"""
+    return '.'.join(str(get_version(label)) for label in labels)
+
+@register.simple_tag(takes_context=True)
+def page_url(context, number, param='page'):
+    """Return the current URL with ?page= (or `param`) set to number"""
+    query = context['request'].GET.copy()
+    query[param] = number
+    return f'?{query.urlencode()}'
@@ -5,6 +5,22 @@ from rest_framework.test import APIClient
 
 from logistics.models import Booking, Vehicle
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache so cached responses don't leak"""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def metrics_registry(tmp_path, monkeypatch):
+    """Give every test its own metrics directory"""
+    from logistics.metrics import Registry
+    registry = Registry(str(tmp_path / 'metrics'))
+    monkeypatch.setattr('logistics.metrics.registry', registry)
+    return registry
+
 @pytest.fixture
 def api_client():
     """Return an authenticated API client"""
@@ -0,0 +1,240 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from datetime import timedelta
+
+from logistics.jobs import enqueue
+from logistics import benchmarks
+from logistics.counters import find_counter_drift
+from logistics.models import Booking, Vehicle, Job
+from logistics.seeding import Seeder
+from logistics.vins import is_valid_vin
+
+
+@pytest.fixture
+def old_booking():
+    """Create a booking whose ship arrived well over six months ago"""
+    arrival_date = timezone.now() - timedelta(days=365)
+
+    booking = Booking.objects.create(
+        booking_number="BK-OLD-FIXTURE",
+        loading_port="Antwerp",
+        discharge_port="Lagos",
+        ship_departure_date=arrival_date - timedelta(days=10),
+        ship_arrival_date=arrival_date
+    )
+    for i in range(5):
+        Vehicle.objects.create(
+            vin=f"OLDVEHICLE{i}000000"[:17],
+            make="Toyota",
+            model="Corolla",
+            weight=1300.00,
+            booking=booking
+        )
+    return booking
+
+
+@pytest.mark.django_db
+class TestRemoveOldVehicles:
+    """Tests for the remove_old_vehicles management command"""
+
+    def test_removes_old_vehicles_in_batches(self, old_booking, sample_vehicle):
+        """Test old vehicles are purged batch by batch and recent ones are kept"""
+        out = StringIO()
+        call_command('remove_old_vehicles', '--batch-size', '2', stdout=out)
+
+        assert not Vehicle.objects.filter(booking=old_booking).exists()
+        assert Vehicle.objects.filter(pk=sample_vehicle.pk).exists()
+        assert out.getvalue().count('so far') == 3
+        assert 'Successfully deleted 5 vehicles' in out.getvalue()
+
+    def test_dry_run_deletes_nothing(self, old_booking):
+        """Test --dry-run only reports the number of vehicles"""
+        out = StringIO()
+        call_command('remove_old_vehicles', '--dry-run', stdout=out)
+
+        assert '5 vehicles' in out.getvalue()
+        assert Vehicle.objects.filter(booking=old_booking).count() == 5
+
+    def test_max_rows_caps_the_purge(self, old_booking):
+        """Test --max-rows stops the purge early"""
+        call_command('remove_old_vehicles', '--batch-size', '2', '--max-rows', '3', stdout=StringIO())
+
+        assert Vehicle.objects.filter(booking=old_booking).count() == 2
+
+    def test_no_raw_uses_the_orm_collector(self, old_booking):
+        """Test --no-raw deletes the same vehicles through the ORM"""
+        call_command('remove_old_vehicles', '--no-raw', stdout=StringIO())
+
+        assert not Vehicle.objects.filter(booking=old_booking).exists()
+        old_booking.refresh_from_db()
+        assert old_booking.vehicle_count == 0
+
+    @pytest.mark.parametrize('option, value', [
+        ('--batch-size', '0'), ('--batch-size', '-1'), ('--max-rows', '0'), ('--max-rows', '-5'),
+    ])
+    def test_rejects_counts_below_one(self, old_booking, option, value):
+        """Test batch sizes and row caps below 1 are refused instead of deleting nothing or crashing"""
+        with pytest.raises(CommandError, match=f'{option} must be at least 1'):
+            call_command('remove_old_vehicles', option, value, stdout=StringIO())
+
+        assert Vehicle.objects.filter(booking=old_booking).count() == 5
+
+    def test_raw_purge_updates_booking_totals(self, old_booking):
+        """Test the raw delete path keeps the booking totals in step"""
+        call_command('remove_old_vehicles', '--batch-size', '2', '--max-rows', '3', stdout=StringIO())
+
+        old_booking.refresh_from_db()
+        assert old_booking.vehicle_count == 2
+        assert old_booking.total_weight == 2600
+
+
+@pytest.mark.django_db
+class TestRecountBookings:
+    """Tests for the recount_bookings management command"""
+
+    def test_verify_reports_drift(self, old_booking):
+        """Test --verify fails when totals are out of date and leaves them alone"""
+        Booking.objects.filter(pk=old_booking.pk).update(vehicle_count=0)
+
+        with pytest.raises(CommandError):
+            call_command('recount_bookings', '--verify', stdout=StringIO())
+
+        old_booking.refresh_from_db()
+        assert old_booking.vehicle_count == 0
+
+    def test_recount_repairs_drift(self, old_booking):
+        """Test the command rewrites out of date totals"""
+        Booking.objects.filter(pk=old_booking.pk).update(vehicle_count=0, total_weight=0)
+        out = StringIO()
+
+        call_command('recount_bookings', stdout=out)
+
+        old_booking.refresh_from_db()
+        assert old_booking.vehicle_count == 5
+        assert old_booking.total_weight == 6500
+        assert '1 had out of date totals' in out.getvalue()
+        call_command('recount_bookings', '--verify', stdout=StringIO())
+
+
+@pytest.mark.django_db
+class TestRunJobs:
+    """Tests for the run_jobs worker command"""
+
+    def test_runs_queued_purge(self, old_booking):
+        """Test the worker runs a queued purge and records the result"""
+        job = enqueue(Job.KIND_PURGE_OLD_VEHICLES, days=180, batch_size=2)
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        assert job.status == Job.STATUS_SUCCEEDED
+        assert job.result == {'deleted': 5}
+        assert job.rows_processed == 5
+        assert job.finished_at is not None
+        assert not Vehicle.objects.filter(booking=old_booking).exists()
+
+    def test_records_failures(self):
+        """Test a failing job is marked failed with its error"""
+        job = enqueue(Job.KIND_PURGE_OLD_VEHICLES, unexpected=True)
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        assert job.status == Job.STATUS_FAILED
+        assert 'unexpected' in job.error
+
+    def test_requeue_running(self):
+        """Test jobs left running by a stopped worker can be requeued and run"""
+        job = Job.objects.create(kind=Job.KIND_PURGE_OLD_VEHICLES, status=Job.STATUS_RUNNING)
+
+        call_command('run_jobs', '--once', '--requeue-running', stdout=StringIO())
+
+        job.refresh_from_db()
+        assert job.status == Job.STATUS_SUCCEEDED
+
+
+@pytest.mark.django_db
+class TestSeedLogistics:
+    """Tests for the seed_logistics command"""
+
+    def test_seeds_bookings_and_vehicles(self, sample_vehicle):
+        """Test the requested rows are created in batches with valid data and totals"""
+        out = StringIO()
+        call_command('seed_logistics', '--bookings', '7', '--vehicles', '45',
+                     '--batch-size', '20', '--seed', '3', stdout=out)
+
+        seeded = Vehicle.objects.exclude(pk=sample_vehicle.pk)
+        assert Booking.objects.count() == 8
+        assert seeded.count() == 45
+        assert all(is_valid_vin(vin) for vin in seeded.values_list('vin', flat=True))
+        assert not Booking.objects.filter(ship_arrival_date__lte=timezone.now() - timedelta(days=1000)).exists()
+        assert not find_counter_drift().exists()
+        assert out.getvalue().count('vehicles so far') == 3
+
+    def test_seed_is_reproducible(self):
+        """Test the same seed generates the same rows"""
+        first = Seeder(seed=11).make_vehicles(20, [1, 2])
+        second = Seeder(seed=11).make_vehicles(20, [1, 2])
+
+        assert [(v.vin, v.make, v.weight, v.booking_id) for v in first] == \
+            [(v.vin, v.make, v.weight, v.booking_id) for v in second]
+
+    def test_existing_vins_are_skipped(self):
+        """Test generated VINs that already exist are replaced"""
+        taken = Seeder(seed=5).make_vehicles(10, [])
+        Vehicle.objects.bulk_create(taken)
+
+        vins = [v.vin for v in Seeder(seed=5).make_vehicles(10, [])]
+
+        assert len(set(vins)) == 10
+        assert not Vehicle.objects.filter(vin__in=vins).exists()
+
+
+@pytest.mark.django_db
+class TestBenchmarks:
+    """Tests for the benchmark scenarios and regression checks"""
+
+    def test_scenarios_run_within_query_budgets(self):
+        """Test every scenario succeeds on a small dataset and stays within its query budget"""
+        Seeder(seed=1).run(bookings=5, vehicles=60)
+
+        results = benchmarks.run_benchmarks(repeat=1)
+
+        assert set(results) == {scenario.name for scenario in benchmarks.SCENARIOS}
+        assert benchmarks.find_regressions(results, {}) == []
+        assert Vehicle.objects.count() == 60
+
+    def test_regressions_are_reported(self):
+        """Test extra queries, slowdowns and memory growth past the tolerances fail"""
+        baseline = {'booking-list': {'time': 0.1, 'queries': 2, 'memory': 1024 * 1024}}
+        within = {'booking-list': {'time': 0.12, 'queries': 2, 'memory': 1100 * 1024}}
+        over = {'booking-list': {'time': 0.5, 'queries': 4, 'memory': 4096 * 1024}}
+
+        assert benchmarks.find_regressions(within, baseline) == []
+        assert len(benchmarks.find_regressions(over, baseline)) == 4
+
+
+@pytest.mark.django_db
+class TestProfiles:
+    """Tests for the profiles command"""
+
+    def test_list_and_summarize(self, client, django_user_model, tmp_path, monkeypatch):
+        """Test captured profiles are listed and their top functions printed"""
+        monkeypatch.setattr('logistics.app_settings.PROFILE_DIR', str(tmp_path))
+        client.force_login(django_user_model.objects.create_user('staff', is_staff=True))
+        profile_id = client.get('/api/bookings/', {'profile': 1})['X-Profile']
+
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        assert profile_id in out.getvalue()
+        assert 'GET /api/bookings/?profile=1' in out.getvalue()
+
+        out = StringIO()
+        call_command('profiles', profile_id, '--limit', '5', stdout=out)
+        assert 'function calls' in out.getvalue()
+
+        with pytest.raises(CommandError):
+            call_command('profiles', 'missing', stdout=StringIO())
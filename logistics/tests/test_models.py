@@ -2,8 +2,10 @@ import pytest
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 
 from logistics.models import Booking, Vehicle
+from logistics.vins import is_valid_vin, vin_check_digit
 
 # Model creation tests
 @pytest.mark.django_db
@@ -92,7 +94,252 @@ def test_create_random_vehicle(sample_booking):
     
     assert vehicle.vin is not None
     assert len(vehicle.vin) == 17  # Valid VIN length
+    assert is_valid_vin(vehicle.vin)
     assert vehicle.make is not None
     assert vehicle.model is not None
     assert vehicle.weight > 0
-    assert vehicle.booking == sample_booking
\ No newline at end of file
+    assert vehicle.booking == sample_booking
+
+@pytest.mark.django_db
+def test_bulk_add_vehicles_to_booking(sample_booking, sample_vehicle):
+    """Test moving many vehicles between bookings in one call"""
+    loose = Vehicle.objects.create(
+        vin="LOOSE123456789ABC",
+        make="Ford",
+        model="Focus",
+        weight=1500.00
+    )
+
+    updated, not_found = Vehicle.bulkAddToBooking(
+        sample_booking.id, vehicle_ids=[loose.id, 999999]
+    )
+    assert updated == 1
+    assert not_found == [999999]
+    assert sample_booking.vehicles.count() == 2
+
+    updated, not_found = Vehicle.bulkAddToBooking(0, filters={'booking': sample_booking.id})
+    assert updated == 2
+    assert not_found == []
+    assert not Vehicle.objects.filter(booking__isnull=False).exists()
+
+@pytest.mark.django_db
+def test_bulk_add_vehicles_to_missing_booking(sample_vehicle):
+    """Test bulk association fails for a booking that does not exist"""
+    with pytest.raises(ValueError):
+        Vehicle.bulkAddToBooking(999999, vins=[sample_vehicle.vin])
+
+
+# Denormalized booking totals
+def assert_totals(booking, count, weight):
+    booking.refresh_from_db()
+    assert booking.vehicle_count == count
+    assert booking.total_weight == Decimal(weight)
+
+@pytest.mark.django_db
+def test_booking_totals_follow_vehicle_changes(sample_booking):
+    """Test vehicle_count and total_weight track creates, moves, edits and deletes"""
+    other = Booking.objects.create(
+        booking_number="BK-OTHER",
+        loading_port="Bremerhaven",
+        discharge_port="Baltimore",
+        ship_departure_date=timezone.now(),
+        ship_arrival_date=timezone.now() + timedelta(days=9)
+    )
+    vehicle = Vehicle.createVehicle(
+        vin="1FTEW1E85AFA12345",
+        make="Ford",
+        model="F-150",
+        weight=2200.50,
+        booking=sample_booking
+    )
+    assert_totals(sample_booking, 1, "2200.50")
+
+    vehicle = Vehicle.objects.get(pk=vehicle.pk)
+    vehicle.addVehicleToBooking(other.id)
+    assert_totals(sample_booking, 0, "0")
+    assert_totals(other, 1, "2200.50")
+
+    vehicle.weight = Decimal("2000.00")
+    vehicle.save()
+    assert_totals(other, 1, "2000.00")
+
+    vehicle.addVehicleToBooking(0)
+    assert_totals(other, 0, "0")
+
+    sample_booking.addVehicleToBooking(vehicle)
+    assert_totals(sample_booking, 1, "2000.00")
+
+    vehicle.delete()
+    assert_totals(sample_booking, 0, "0")
+
+@pytest.mark.django_db
+def test_booking_totals_follow_bulk_changes(sample_booking, sample_vehicle):
+    """Test bulk association and queryset deletes keep the totals in step"""
+    loose = Vehicle.objects.create(vin="LOOSE123456789ABC", make="Ford", model="Focus", weight=1500.00)
+
+    Vehicle.bulkAddToBooking(sample_booking.id, vehicle_ids=[loose.id])
+    assert_totals(sample_booking, 2, "3300.00")
+
+    Vehicle.objects.filter(pk=loose.pk).delete()
+    assert_totals(sample_booking, 1, "1800.00")
+
+    Vehicle.bulkAddToBooking(0, filters={'booking': sample_booking.id})
+    assert_totals(sample_booking, 0, "0")
+
+@pytest.mark.django_db
+def test_bulk_move_from_many_bookings_updates_totals_in_constant_queries(sample_booking):
+    """Test moving vehicles out of many bookings takes them off all totals with one UPDATE"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    sources = []
+    for i in range(4):
+        booking = Booking.objects.create(
+            booking_number=f"BK-SOURCE-{i}",
+            loading_port="Antwerp",
+            discharge_port="Lagos",
+            ship_departure_date=timezone.now(),
+            ship_arrival_date=timezone.now() + timedelta(days=5)
+        )
+        for j in range(2):
+            Vehicle.objects.create(vin=f"MOVE{i}{j}00000000000", make="Kia", model="Ceed",
+                                   weight=1000 + j, booking=booking)
+        sources.append(booking)
+
+    with CaptureQueriesContext(connection) as queries:
+        updated, _ = Vehicle.bulkAddToBooking(sample_booking.id, filters={'make': 'Kia'})
+
+    assert updated == 8
+    booking_updates = [q for q in queries if q['sql'].startswith('UPDATE "logistics_booking"')]
+    assert len(booking_updates) == 2  # Off the sources, onto the target
+    for booking in sources:
+        assert_totals(booking, 0, "0")
+    assert_totals(sample_booking, 8, "8004.00")
+
+@pytest.mark.django_db
+def test_deleting_a_partly_loaded_vehicle_updates_the_totals(sample_vehicle):
+    """Test deleting a vehicle loaded without its booking and weight still updates the totals"""
+    Vehicle.objects.only('vin').get(pk=sample_vehicle.pk).delete()
+
+    assert not Vehicle.objects.filter(pk=sample_vehicle.pk).exists()
+    assert_totals(sample_vehicle.booking, 0, "0")
+
+@pytest.mark.django_db
+def test_moving_a_vehicle_created_with_a_string_weight(sample_booking):
+    """Test a weight given as a string is counted correctly across saves"""
+    vehicle = Vehicle.objects.create(vin="STRWEIGHT12345678", make="Ford", model="Focus", weight="1500.00")
+
+    vehicle.booking = sample_booking
+    vehicle.save()
+    assert_totals(sample_booking, 1, "1500.00")
+
+    vehicle.booking = None
+    vehicle.save()
+    assert_totals(sample_booking, 0, "0")
+
+@pytest.mark.django_db
+def test_counter_deltas_apply_with_one_update(sample_booking):
+    """Test the deltas of many bookings are written by a single UPDATE"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from logistics.counters import CounterDeltas
+
+    bookings = [sample_booking] + [
+        Booking.objects.create(
+            booking_number=f"BK-DELTA-{i}",
+            loading_port="Antwerp",
+            discharge_port="Lagos",
+            ship_departure_date=timezone.now(),
+            ship_arrival_date=timezone.now() + timedelta(days=5)
+        )
+        for i in range(3)
+    ]
+    deltas = CounterDeltas()
+    for i, booking in enumerate(bookings):
+        deltas.add(booking.pk, i + 1, Decimal("100.25") * (i + 1))
+
+    with CaptureQueriesContext(connection) as queries:
+        deltas.apply()
+
+    assert len(queries) == 1
+    for i, booking in enumerate(bookings):
+        assert_totals(booking, i + 1, str(Decimal("100.25") * (i + 1)))
+
+@pytest.mark.django_db
+def test_saving_a_stale_booking_keeps_the_totals(sample_booking):
+    """Test saving a booking loaded before a vehicle change does not overwrite its totals"""
+    stale = Booking.objects.get(pk=sample_booking.pk)
+    Vehicle.objects.create(vin="STALE123456789ABC", make="Ford", model="Focus", weight=1000,
+                           booking=Booking.objects.get(pk=sample_booking.pk))
+
+    stale.discharge_port = "Durban"
+    stale.save()
+
+    assert_totals(sample_booking, 1, "1000.00")
+    assert sample_booking.discharge_port == "Durban"
+
+@pytest.mark.django_db
+def test_recount_bookings_repairs_drift(sample_vehicle):
+    """Test the recount helpers detect and repair out of date totals"""
+    from logistics.counters import find_counter_drift, recount_bookings
+
+    booking = sample_vehicle.booking
+    Booking.objects.filter(pk=booking.pk).update(vehicle_count=7, total_weight=1)
+    assert list(find_counter_drift()) == [booking]
+
+    recount_bookings()
+    assert_totals(booking, 1, "1800.00")
+    assert not find_counter_drift().exists()
+
+
+def query_plan(queryset):
+    """Return SQLite's query plan for a queryset as a single string"""
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("build_queryset, index_name", [
+    (lambda now: Vehicle.objects.filter(booking_id=1).order_by('-created_at'),
+     'logistics_vehicle_booking_idx'),
+    (lambda now: Vehicle.objects.order_by('-created_at', '-id')[:10],
+     'logistics_vehicle_created_idx'),
+    (lambda now: Vehicle.objects.filter(make="Tesla"),
+     'logistics_vehicle_make_idx'),
+    (lambda now: Booking.objects.filter(ship_arrival_date__lt=now).order_by('ship_arrival_date'),
+     'logistics_booking_arrival_idx'),
+    (lambda now: Vehicle.objects.filter(booking__ship_arrival_date__lt=now).order_by(),
+     'logistics_booking_arrival_idx'),
+    (lambda now: Booking.objects.order_by('ship_departure_date'),
+     'logistics_booking_depart_idx'),
+    (lambda now: Booking.objects.order_by('-created_at', '-id')[:10],
+     'logistics_booking_created_idx'),
+    (lambda now: Booking.objects.filter(loading_port="Rotterdam"),
+     'logistics_booking_loading_idx'),
+    (lambda now: Booking.objects.filter(discharge_port="Singapore"),
+     'logistics_booking_dischg_idx'),
+])
+def test_hot_queries_use_indexes(build_queryset, index_name):
+    """Test SQLite plans the hot query paths with the dedicated indexes"""
+    from django.db import connection
+
+    if connection.vendor != 'sqlite':
+        pytest.skip("Query plan assertions are written for SQLite")
+
+    plan = query_plan(build_queryset(timezone.now()))
+    assert index_name in plan, plan
+
+
+def test_vin_check_digit():
+    """Test the check digit of a known VIN, including the X remainder"""
+    assert vin_check_digit("1M8GDM9AXKP042788") == "X"
+    assert is_valid_vin("11111111111111111")
+    assert not is_valid_vin("1M8GDM9A1KP042788")
+
+def test_vin_with_disallowed_characters_is_invalid():
+    """Test I, O, Q and lowercase letters make a VIN invalid instead of raising"""
+    assert not is_valid_vin("1M8GDM9AXKP04278O")
+    assert not is_valid_vin("1m8gdm9axkp042788")
@@ -18,6 +18,7 @@ class TestBookingSerializer:
         assert data["loading_port"] == "Rotterdam"
         assert data["discharge_port"] == "Singapore"
         assert "vehicle_count" in data
+        assert data["total_weight"] == "0.00"
     
     def test_deserialize_booking(self):
         """Test deserializing data to create a booking"""
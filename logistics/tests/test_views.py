@@ -1,8 +1,13 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import status
 
-from logistics.models import Booking, Vehicle
+from logistics.models import Booking, Vehicle, Job
 
 @pytest.mark.django_db
 class TestBookingViewSet:
@@ -88,6 +93,95 @@ class TestBookingViewSet:
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert not Booking.objects.filter(id=sample_booking.id).exists()
     
+    def test_list_bookings_query_count_is_constant(self, api_client, sample_vehicle):
+        """Test the booking list does not issue per-booking queries"""
+        url = reverse('logistics:booking-list')
+
+        with CaptureQueriesContext(connection) as baseline:
+            api_client.get(url)
+
+        # Add more bookings, each with a few vehicles
+        now = timezone.now()
+        for i in range(5):
+            booking = Booking.objects.create(
+                booking_number=f"BK-QUERY-{i}",
+                loading_port="Valencia",
+                discharge_port="Genoa",
+                ship_departure_date=now,
+                ship_arrival_date=now + timedelta(days=3)
+            )
+            for j in range(3):
+                Vehicle.objects.create(
+                    vin=f"QRYCNT{i}{j}000000000"[:17],
+                    make="Fiat",
+                    model="500",
+                    weight=900.00,
+                    booking=booking
+                )
+
+        with CaptureQueriesContext(connection) as grown:
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(grown) == len(baseline)
+
+        bookings = response.data['results'] if 'results' in response.data else response.data
+        counts = {b['booking_number']: b['vehicle_count'] for b in bookings}
+        assert counts["BK-QUERY-0"] == 3
+
+    def test_list_bookings_is_slim(self, api_client, sample_vehicle):
+        """Test the list omits nested vehicles but reports aggregates"""
+        url = reverse('logistics:booking-list')
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        booking = response.data['results'][0]
+        assert 'vehicles' not in booking
+        assert booking['vehicle_count'] == 1
+        assert booking['total_weight'] == "1800.00"
+
+    def test_list_bookings_expand_vehicles(self, api_client, sample_vehicle):
+        """Test ?expand=vehicles embeds the nested vehicles in the list"""
+        url = reverse('logistics:booking-list')
+        response = api_client.get(f"{url}?expand=vehicles")
+
+        assert response.status_code == status.HTTP_200_OK
+        booking = response.data['results'][0]
+        assert booking['vehicles'][0]['vin'] == sample_vehicle.vin
+
+    def test_retrieve_booking_vehicle_count(self, api_client, sample_vehicle):
+        """Test the detail endpoint reports the annotated vehicle count"""
+        url = reverse('logistics:booking-detail', args=[sample_vehicle.booking.id])
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['vehicle_count'] == 1
+        assert len(response.data['vehicles']) == 1
+
+    def test_delete_old_vehicles_queues_job(self, api_client):
+        """Test the purge endpoint queues a job and reports its status"""
+        url = reverse('logistics:booking-delete-old-vehicles')
+        response = api_client.delete(url)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job = Job.objects.get(pk=response.data['job_id'])
+        assert job.kind == Job.KIND_PURGE_OLD_VEHICLES
+
+        status_response = api_client.get(response.data['status_url'])
+        assert status_response.status_code == status.HTTP_200_OK
+        assert status_response.data['status'] == Job.STATUS_PENDING
+
+    def test_export_csv(self, api_client, sample_booking):
+        """Test streaming bookings as CSV"""
+        url = reverse('logistics:booking-export-csv')
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0].startswith('id,booking_number,loading_port')
+        assert sample_booking.booking_number in lines[1]
+
     def test_export_excel(self, api_client, sample_booking):
         """Test exporting bookings to Excel"""
         url = reverse('logistics:booking-export-excel')
@@ -123,6 +217,48 @@ class TestVehicleViewSet:
         
         assert vehicle_exists, "Sample vehicle not found in response"
     
+    def test_list_vehicles_limit(self, api_client, sample_booking):
+        """Test ?limit= sets the page size up to the server maximum"""
+        for i in range(12):
+            Vehicle.objects.create(vin=f"LIMIT{i:02d}0000000000", make="Seat",
+                                   model="Ibiza", weight=1100.00)
+        url = reverse('logistics:vehicle-list')
+
+        assert len(api_client.get(url).data['results']) == 10
+        assert len(api_client.get(f"{url}?limit=11").data['results']) == 11
+
+    def test_list_vehicles_cursor_pagination(self, api_client):
+        """Test keyset pagination walks every vehicle once in both directions"""
+        for i in range(5):
+            Vehicle.objects.create(vin=f"CURSOR{i}0000000000", make="Seat",
+                                   model="Leon", weight=1200.00)
+        expected = list(Vehicle.objects.order_by('-created_at', '-id').values_list('vin', flat=True))
+        url = reverse('logistics:vehicle-list')
+
+        response = api_client.get(f"{url}?pagination=cursor&limit=2")
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+
+        seen, pages = [], []
+        while True:
+            pages.append(response.data)
+            seen += [v['vin'] for v in response.data['results']]
+            if not response.data['next']:
+                break
+            response = api_client.get(response.data['next'])
+        assert seen == expected
+        assert len(pages) == 3
+
+        previous = api_client.get(pages[-1]['previous'])
+        assert [v['vin'] for v in previous.data['results']] == expected[2:4]
+
+    def test_list_vehicles_invalid_cursor(self, api_client):
+        """Test a malformed cursor is rejected"""
+        url = reverse('logistics:vehicle-list')
+        response = api_client.get(f"{url}?cursor=garbage")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
     def test_filtered_vehicles(self, api_client, sample_booking, sample_vehicle):
         """Test retrieving vehicles filtered by booking"""
         url = reverse('logistics:vehicle-list')
@@ -207,6 +343,52 @@ class TestVehicleViewSet:
         assert response['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         assert 'attachment; filename=' in response['Content-Disposition']
     
+    def test_bulk_assign_by_vin(self, api_client, sample_booking):
+        """Test associating vehicles by VIN through the bulk endpoint"""
+        vehicle = Vehicle.objects.create(
+            vin="BULKASSIGN1234567",
+            make="BMW",
+            model="X5",
+            weight=2100.00
+        )
+        url = reverse('logistics:vehicle-bulk-assign')
+        data = {'booking_id': sample_booking.id, 'vins': [vehicle.vin, "MISSINGVIN1234567"]}
+
+        response = api_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'updated': 1, 'not_found': ["MISSINGVIN1234567"]}
+        assert Vehicle.objects.get(id=vehicle.id).booking == sample_booking
+
+    def test_bulk_assign_requires_selection(self, api_client, sample_booking):
+        """Test the bulk endpoint rejects requests without vehicles"""
+        url = reverse('logistics:vehicle-bulk-assign')
+        response = api_client.post(url, {'booking_id': sample_booking.id}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_excel_query_count_is_constant(self, api_client, sample_vehicle):
+        """Test the Excel export does not query per vehicle"""
+        url = reverse('logistics:vehicle-export-excel')
+
+        with CaptureQueriesContext(connection) as baseline:
+            b''.join(api_client.get(url).streaming_content)
+
+        for i in range(5):
+            Vehicle.objects.create(
+                vin=f"XLSXQRY{i}000000000"[:17],
+                make="Kia",
+                model="Ceed",
+                weight=1300.00,
+                booking=sample_vehicle.booking
+            )
+
+        with CaptureQueriesContext(connection) as grown:
+            content = b''.join(api_client.get(url).streaming_content)
+
+        assert content.startswith(b'PK')  # XLSX files are zip archives
+        assert len(grown) == len(baseline)
+
     def test_export_csv(self, api_client, sample_vehicle):
         """Test exporting vehicles to CSV"""
         url = reverse('logistics:vehicle-export-csv')
@@ -214,4 +396,957 @@ class TestVehicleViewSet:
         
         assert response.status_code == status.HTTP_200_OK
         assert response['Content-Type'] == 'text/csv'
-        assert 'attachment; filename=' in response['Content-Disposition']
\ No newline at end of file
+        assert 'attachment; filename=' in response['Content-Disposition']
+
+    def test_export_csv_filtered_by_booking(self, api_client, sample_vehicle):
+        """Test the CSV export streams rows and honours the booking filter"""
+        Vehicle.objects.create(
+            vin="UNASSIGNED1234567",
+            make="Volvo",
+            model="XC60",
+            weight=1900.00
+        )
+        url = reverse('logistics:vehicle-export-csv')
+        response = api_client.get(f"{url}?booking={sample_vehicle.booking.id}")
+
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0] == 'id,vin,make,model,weight,booking_number'
+        assert len(lines) == 2
+        assert lines[1].endswith(f"{sample_vehicle.vin},Tesla,Model 3,1800.00,BK-TEST-FIXTURE")
+
+    def test_import_csv(self, api_client, sample_booking):
+        """Test bulk importing vehicles from CSV with a per-row error report"""
+        csv_content = (
+            "vin,make,model,weight,booking_number\n"
+            "1HGCM82633A004352,Honda,Accord,1450.00,BK-TEST-FIXTURE\n"
+            "2HGCM82633A004353,Honda,Civic,1200.50,\n"
+            "BADVIN,Honda,Civic,1200.50,\n"
+            "3HGCM82633A004354,Honda,Jazz,1100,BK-MISSING\n"
+            "1HGCM82633A004352,Honda,Accord,1450.00,\n"
+            "4HGCM82633A004355,Honda,HR-V,heavy,\n"
+        )
+        upload = SimpleUploadedFile("vehicles.csv", csv_content.encode(), content_type="text/csv")
+        url = reverse('logistics:vehicle-import-file')
+
+        response = api_client.post(f"{url}?batch_size=2", {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 2
+        assert [e['row'] for e in response.data['errors']] == [3, 4, 5, 6]
+        sample_booking.refresh_from_db()
+        assert sample_booking.vehicle_count == 1
+        assert Vehicle.objects.get(vin="1HGCM82633A004352").booking == sample_booking
+        assert Vehicle.objects.get(vin="2HGCM82633A004353").booking is None
+
+    def test_import_csv_strict_rolls_back(self, api_client):
+        """Test strict imports write nothing when a row is invalid"""
+        csv_content = (
+            "vin,make,model,weight\n"
+            "1HGCM82633A004352,Honda,Accord,1450.00\n"
+            "BADVIN,Honda,Civic,1200.50\n"
+        )
+        upload = SimpleUploadedFile("vehicles.csv", csv_content.encode(), content_type="text/csv")
+        url = reverse('logistics:vehicle-import-file')
+
+        response = api_client.post(f"{url}?strict=1", {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['created'] == 0
+        assert not Vehicle.objects.exists()
+
+    def test_import_xlsx(self, api_client, sample_booking):
+        """Test bulk importing vehicles from an XLSX workbook"""
+        openpyxl = pytest.importorskip("openpyxl")
+        from io import BytesIO
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["VIN", "Make", "Model", "Weight", "Booking"])
+        sheet.append(["5YJ3E1EA7JF000001", "Tesla", "Model 3", 1800, "BK-TEST-FIXTURE"])
+        sheet.append(["5YJ3E1EA7JF000002", "Tesla", "Model Y", 2000, "Not assigned"])
+        output = BytesIO()
+        workbook.save(output)
+
+        upload = SimpleUploadedFile("vehicles.xlsx", output.getvalue())
+        url = reverse('logistics:vehicle-import-file')
+        response = api_client.post(url, {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 2
+        assert sample_booking.vehicles.count() == 1
+
+    def test_import_in_background(self, api_client, tmp_path, monkeypatch):
+        """Test background imports are queued and processed by the worker"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        monkeypatch.setattr('logistics.jobs.JOBS_UPLOAD_DIR', str(tmp_path))
+        csv_content = "vin,make,model,weight\n1HGCM82633A004352,Honda,Accord,1450.00\n"
+        upload = SimpleUploadedFile("vehicles.csv", csv_content.encode(), content_type="text/csv")
+        url = reverse('logistics:vehicle-import-file')
+
+        response = api_client.post(f"{url}?background=1", {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        job = Job.objects.get(pk=response.data['job_id'])
+        assert job.status == Job.STATUS_SUCCEEDED
+        assert job.result['created'] == 1
+        assert Vehicle.objects.filter(vin="1HGCM82633A004352").exists()
+        assert not any(tmp_path.iterdir())
+
+    def test_import_rejects_unknown_file_type(self, api_client):
+        """Test the import endpoint only accepts CSV and XLSX uploads"""
+        upload = SimpleUploadedFile("vehicles.txt", b"vin,make")
+        url = reverse('logistics:vehicle-import-file')
+        response = api_client.post(url, {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize('name, content', [
+        ('vehicles.csv', b'vin,make\n"' + b'A' * 200000 + b'",Kia\n'),
+        ('vehicles.xlsx', b'not a workbook'),
+    ])
+    def test_import_rejects_malformed_files(self, api_client, name, content):
+        """Test files that cannot be parsed are reported as a 400, not a server error"""
+        upload = SimpleUploadedFile(name, content)
+        url = reverse('logistics:vehicle-import-file')
+        response = api_client.post(url, {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'Malformed' in response.data['error']
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    """Tests for the versioned API response cache"""
+
+    def test_repeated_list_is_served_from_cache(self, api_client, sample_vehicle):
+        """Test a second identical GET is served from the cache"""
+        url = reverse('logistics:vehicle-list')
+        first = api_client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = api_client.get(url)
+
+        assert first['X-Cache'] == 'MISS'
+        assert second['X-Cache'] == 'HIT'
+        assert second.data == first.data
+        assert len(queries) == 0  # Neither the ETag nor the cached payload touches the database
+
+        stats = api_client.get(reverse('logistics:cache-stats')).data
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_filtered_lists_are_cached_separately(self, api_client, sample_vehicle):
+        """Test the ?booking= filter is part of the cache key"""
+        url = reverse('logistics:vehicle-list')
+        api_client.get(url)
+
+        response = api_client.get(f"{url}?booking=999999")
+
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['results'] == []
+
+    def test_writes_invalidate_cached_responses(self, api_client, sample_vehicle):
+        """Test model, bulk and API writes all bump the cache version"""
+        booking = sample_vehicle.booking
+        booking_url = reverse('logistics:booking-detail', args=[booking.id])
+        vehicles_url = reverse('logistics:vehicle-list')
+        api_client.get(booking_url)
+        api_client.get(vehicles_url)
+
+        Vehicle.bulkAddToBooking(0, vehicle_ids=[sample_vehicle.id])
+
+        booking_response = api_client.get(booking_url)
+        assert booking_response['X-Cache'] == 'MISS'
+        assert booking_response.data['vehicle_count'] == 0
+        vehicles_response = api_client.get(vehicles_url)
+        assert vehicles_response['X-Cache'] == 'MISS'
+        assert vehicles_response.data['results'][0]['booking'] is None
+
+        api_client.patch(booking_url, {'loading_port': 'Amsterdam'}, format='json')
+        assert api_client.get(booking_url).data['loading_port'] == 'Amsterdam'
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Tests for ETag / Last-Modified revalidation"""
+
+    @pytest.mark.parametrize('route', ['logistics:booking-detail', 'logistics:vehicle-detail'])
+    def test_non_numeric_pk_is_not_found(self, api_client, route):
+        """Test a malformed primary key is a 404, not a server error"""
+        response = api_client.get(reverse(route, args=['abc']))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_list_not_modified(self, api_client, sample_vehicle):
+        """Test a matching If-None-Match returns 304 without a body"""
+        url = reverse('logistics:vehicle-list')
+        response = api_client.get(url)
+        etag = response['ETag']
+        assert 'Last-Modified' not in response
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified.content == b''
+        assert len(queries) == 0  # The ETag comes from the cache versions
+
+    def test_etag_changes_with_data_and_params(self, api_client, sample_vehicle):
+        """Test writes and different filters produce different ETags"""
+        url = reverse('logistics:vehicle-list')
+        etag = api_client.get(url)['ETag']
+
+        assert api_client.get(f"{url}?booking={sample_vehicle.booking.id}")['ETag'] != etag
+
+        Vehicle.objects.filter(pk=sample_vehicle.pk).delete()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_list_etag_changes_when_a_booking_is_deleted(self, api_client, sample_vehicle):
+        """Test deleting a booking, which unassigns its vehicles, changes the vehicle list ETag"""
+        url = reverse('logistics:vehicle-list')
+        etag = api_client.get(url)['ETag']
+
+        api_client.delete(reverse('logistics:booking-detail', args=[sample_vehicle.booking.id]))
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'][0]['booking'] is None
+
+    def test_booking_detail_tracks_vehicle_changes(self, api_client, sample_vehicle):
+        """Test editing an embedded vehicle changes the booking detail ETag"""
+        url = reverse('logistics:booking-detail', args=[sample_vehicle.booking.id])
+        etag = api_client.get(url)['ETag']
+
+        Vehicle.objects.filter(pk=sample_vehicle.pk).update(
+            make="Polestar", updated_at=timezone.now() + timedelta(seconds=1)
+        )
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_if_modified_since(self, api_client, sample_booking):
+        """Test If-Modified-Since returns 304 for an unchanged booking"""
+        url = reverse('logistics:booking-detail', args=[sample_booking.id])
+        last_modified = api_client.get(url)['Last-Modified']
+
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    """Tests for ?fields= / ?omit= and their query pushdown"""
+
+    def test_vehicle_fields(self, api_client, sample_vehicle):
+        """Test ?fields= narrows both the payload and the SELECT"""
+        url = reverse('logistics:vehicle-list')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f"{url}?fields=id,vin,booking")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [
+            {'id': sample_vehicle.id, 'vin': sample_vehicle.vin, 'booking': sample_vehicle.booking.id}
+        ]
+        select = [q['sql'] for q in queries.captured_queries if '"logistics_vehicle"."vin"' in q['sql']][-1]
+        assert '"make"' not in select
+        assert '"weight"' not in select
+
+    def test_vehicle_omit(self, api_client, sample_vehicle):
+        """Test ?omit= drops the named fields"""
+        url = reverse('logistics:vehicle-detail', args=[sample_vehicle.id])
+        response = api_client.get(f"{url}?omit=created_at,updated_at")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'created_at' not in response.data
+        assert 'updated_at' not in response.data
+        assert response.data['make'] == "Tesla"
+
+    def test_booking_detail_skips_vehicle_prefetch(self, api_client, sample_vehicle):
+        """Test leaving out vehicles skips the prefetch query"""
+        url = reverse('logistics:booking-detail', args=[sample_vehicle.booking.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f"{url}?fields=id,booking_number,vehicle_count")
+
+        assert response.data == {
+            'id': sample_vehicle.booking.id,
+            'booking_number': "BK-TEST-FIXTURE",
+            'vehicle_count': 1,
+        }
+        assert not any('FROM "logistics_vehicle"' in q['sql'] for q in queries.captured_queries)
+
+    def test_fields_do_not_restrict_writes(self, api_client, sample_booking):
+        """Test ?fields= does not stop fields from being written"""
+        url = reverse('logistics:booking-detail', args=[sample_booking.id])
+        response = api_client.patch(f"{url}?fields=id", {'loading_port': 'Le Havre'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        sample_booking.refresh_from_db()
+        assert sample_booking.loading_port == 'Le Havre'
+
+
+@pytest.mark.django_db
+class TestBookingCalendar:
+    """Tests for the calendar events endpoint"""
+
+    def test_events_in_window(self, api_client, sample_vehicle):
+        """Test only events inside the window are returned, one row per event"""
+        booking = sample_vehicle.booking
+        Booking.objects.create(
+            booking_number="BK-FAR-AWAY",
+            loading_port="Busan",
+            discharge_port="Durban",
+            ship_departure_date=timezone.now() + timedelta(days=200),
+            ship_arrival_date=timezone.now() + timedelta(days=230)
+        )
+        start = (timezone.now() - timedelta(days=1)).date().isoformat()
+        end = (timezone.now() + timedelta(days=30)).date().isoformat()
+        url = reverse('logistics:booking-calendar')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, {'start': start, 'end': end})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['fields'][:3] == ['booking_id', 'booking_number', 'type']
+        assert [(e[1], e[2], e[4], e[5]) for e in response.data['events']] == [
+            (booking.booking_number, 'departure', 'Rotterdam', 1),
+            (booking.booking_number, 'arrival', 'Singapore', 1),
+        ]
+        assert len(queries) == 2
+
+    def test_window_only_catches_arrival(self, api_client, sample_booking):
+        """Test a window around the arrival date returns just the arrival"""
+        arrival = sample_booking.ship_arrival_date
+        response = api_client.get(reverse('logistics:booking-calendar'), {
+            'start': (arrival - timedelta(hours=1)).isoformat(),
+            'end': (arrival + timedelta(hours=1)).isoformat(),
+        })
+
+        assert [e[2] for e in response.data['events']] == ['arrival']
+
+    def test_invalid_window(self, api_client):
+        """Test missing, reversed or oversized windows are rejected"""
+        url = reverse('logistics:booking-calendar')
+
+        assert api_client.get(url).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'start': '2025-02-01', 'end': '2025-01-01'}).status_code == 400
+        assert api_client.get(url, {'start': '2020-01-01', 'end': '2025-01-01'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestSearch:
+    """Tests for ?search= on the booking and vehicle lists"""
+
+    @pytest.fixture
+    def vehicles(self, sample_vehicle):
+        Vehicle.objects.bulk_create([
+            Vehicle(vin="1HGCM82633A004352", make="Honda", model="Accord", weight=1500),
+            Vehicle(vin="1HGCM82633A004353", make="Honda", model="Civic Tesla Edition", weight=1300),
+            Vehicle(vin="WBA3A5C51CF256985", make="BMW", model="320i", weight=1550),
+        ])
+        return Vehicle.objects.all()
+
+    def search(self, api_client, name, term):
+        response = api_client.get(reverse(f'logistics:{name}-list'), {'search': term})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['results']
+
+    def test_vin_prefix(self, api_client, vehicles):
+        """Test a VIN prefix is matched case-insensitively with a range scan"""
+        results = self.search(api_client, 'vehicle', '1hgcm')
+
+        assert [v['vin'] for v in results] == ["1HGCM82633A004352", "1HGCM82633A004353"]
+
+    def test_text_search_is_ranked(self, api_client, vehicles):
+        """Test make and model words are matched by prefix, best match first"""
+        results = self.search(api_client, 'vehicle', 'tesl')
+
+        assert [v['make'] for v in results] == ["Tesla", "Honda"]
+        assert self.search(api_client, 'vehicle', 'honda civ')[0]['model'] == "Civic Tesla Edition"
+        assert self.search(api_client, 'vehicle', 'nothing like this') == []
+
+    def test_index_follows_writes(self, api_client, vehicles):
+        """Test updates and deletes are reflected by the search index"""
+        Vehicle.objects.filter(make="BMW").update(make="Volvo")
+        Vehicle.objects.filter(model="Accord").delete()
+
+        assert [v['make'] for v in self.search(api_client, 'vehicle', 'volvo')] == ["Volvo"]
+        assert self.search(api_client, 'vehicle', 'bmw') == []
+        assert self.search(api_client, 'vehicle', 'accord') == []
+
+    def test_booking_search(self, api_client, sample_booking):
+        """Test bookings are found by number prefix and by port"""
+        assert [b['booking_number'] for b in self.search(api_client, 'booking', 'BK-TEST')] == ["BK-TEST-FIXTURE"]
+        assert [b['booking_number'] for b in self.search(api_client, 'booking', 'singap')] == ["BK-TEST-FIXTURE"]
+        assert self.search(api_client, 'booking', 'hamburg') == []
+
+    @pytest.mark.parametrize('term, expected', [('1hgcm', 2), ('honda', 2), ('tesla', 2)])
+    def test_csv_export_honours_search(self, api_client, vehicles, term, expected):
+        """Test the vehicle CSV export only contains the searched vehicles"""
+        response = api_client.get(reverse('logistics:vehicle-export-csv'), {'search': term})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        assert len(lines) == expected + 1  # Header row
+        assert not any('BMW' in line for line in lines)
+
+    def test_booking_excel_export_honours_search(self, api_client, sample_booking):
+        """Test the booking Excel export leaves out bookings the search does not match"""
+        from io import BytesIO
+        openpyxl = pytest.importorskip("openpyxl")
+
+        response = api_client.get(reverse('logistics:booking-export-excel'), {'search': 'hamburg'})
+        sheet = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content))).active
+
+        assert sheet.max_row == 1  # Header row only
+
+    def test_admin_search(self, admin_client, vehicles):
+        """Test the admin changelist uses the same search"""
+        response = admin_client.get(reverse('admin:logistics_vehicle_changelist'), {'q': 'tesla'})
+
+        assert response.status_code == 200
+        assert response.context['cl'].result_count == 2
+
+
+@pytest.mark.django_db
+class TestAdminPerformance:
+    """Tests for the admin changelists and booking change form on large tables"""
+
+    def make_vehicles(self, booking, count, start=0):
+        Vehicle.objects.bulk_create([
+            Vehicle(vin=f"ADM{i:014d}", make="Volvo", model="XC90", weight=2000, booking=booking)
+            for i in range(start, start + count)
+        ])
+
+    def test_row_estimate_follows_deletes(self):
+        """Test the estimate comes from ANALYZE statistics, not the highest id"""
+        from logistics.admin import estimate_row_count
+        assert estimate_row_count(Vehicle, 'default') is None
+        self.make_vehicles(None, 30)
+        Vehicle.objects.filter(pk__in=Vehicle.objects.order_by('pk').values('pk')[:20]).delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        assert estimate_row_count(Vehicle, 'default') == 10
+
+    def test_vehicle_changelist_queries_do_not_grow(self, admin_client, sample_booking):
+        """Test the booking column is joined instead of fetched per row"""
+        url = reverse('admin:logistics_vehicle_changelist')
+        self.make_vehicles(sample_booking, 3)
+        with CaptureQueriesContext(connection) as few:
+            admin_client.get(url)
+        self.make_vehicles(sample_booking, 30, start=3)
+        with CaptureQueriesContext(connection) as many:
+            response = admin_client.get(url)
+
+        assert response.status_code == 200
+        assert len(many) == len(few)
+
+    def test_booking_filter(self, admin_client, sample_vehicle):
+        """Test vehicles are filtered by booking id and by assignment"""
+        Vehicle.objects.create(vin="UNASSIGNED1234567", make="Ford", model="Focus", weight=1200)
+        url = reverse('admin:logistics_vehicle_changelist')
+
+        by_booking = admin_client.get(url, {'booking': sample_vehicle.booking_id})
+        unassigned = admin_client.get(url, {'booking': 'none'})
+
+        assert [v.vin for v in by_booking.context['cl'].result_list] == [sample_vehicle.vin]
+        assert [v.vin for v in unassigned.context['cl'].result_list] == ["UNASSIGNED1234567"]
+
+    def test_count_is_capped(self, admin_client, sample_booking, monkeypatch):
+        """Test filtered counts stop at the limit and large tables use an estimate"""
+        monkeypatch.setattr('logistics.admin.ADMIN_EXACT_COUNT_LIMIT', 5)
+        self.make_vehicles(sample_booking, 8)
+        url = reverse('admin:logistics_vehicle_changelist')
+
+        assert admin_client.get(url, {'booking': 'assigned'}).context['cl'].result_count == 5
+        # Without statistics the count is capped too
+        assert admin_client.get(url).context['cl'].result_count == 5
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        assert admin_client.get(url).context['cl'].result_count == 8
+
+    def test_inline_is_paginated(self, admin_client, sample_booking, monkeypatch):
+        """Test the booking form only renders one page of vehicles"""
+        monkeypatch.setattr('logistics.admin.PaginatedInlineFormSet.per_page', 10)
+        self.make_vehicles(sample_booking, 25)
+        url = reverse('admin:logistics_booking_change', args=[sample_booking.pk])
+
+        response = admin_client.get(url, {'vehicles_page': 3})
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        assert formset.initial_form_count() == 5
+        assert b'Vehicles 21&ndash;25 of 25' in response.content
+
+
+@pytest.mark.django_db
+class TestListPages:
+    """Tests for the server-rendered booking and vehicle pages"""
+
+    def test_booking_page_is_paginated(self, client, monkeypatch):
+        """Test bookings are rendered one page at a time with constant queries"""
+        monkeypatch.setattr('logistics.templatetags.logistics_tags.TEMPLATE_PAGE_SIZE', 2)
+        departure = timezone.now()
+        for i in range(5):
+            Booking.objects.create(
+                booking_number=f"BK-PAGE-{i}", loading_port="Antwerp", discharge_port="Lagos",
+                ship_departure_date=departure + timedelta(days=i),
+                ship_arrival_date=departure + timedelta(days=i + 10)
+            )
+
+        response = client.get(reverse('booking-list-page'), {'page': 2})
+
+        assert response.status_code == 200
+        content = response.content.decode()
+        assert "BK-PAGE-2" in content and "BK-PAGE-3" in content
+        assert "BK-PAGE-1" not in content and "BK-PAGE-4" not in content
+        assert "Page 2 of 3" in content
+
+    def test_vehicle_page_queries_do_not_grow(self, client, sample_booking):
+        """Test booking numbers are joined instead of fetched per row"""
+        url = reverse('vehicle-list-page')
+        Vehicle.objects.create(vin="PAGE0000000000001", make="Kia", model="Rio", weight=1100,
+                               booking=sample_booking)
+        with CaptureQueriesContext(connection) as few:
+            client.get(url, {'page': 1})
+        Vehicle.objects.bulk_create([
+            Vehicle(vin=f"PAGE{i:013d}", make="Kia", model="Rio", weight=1100, booking=sample_booking)
+            for i in range(2, 20)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            response = client.get(url, {'page': 2})
+
+        assert b"BK-TEST-FIXTURE" in response.content
+        assert len(many) == len(few)
+
+    def test_table_fragment_is_cached_until_write(self, client, sample_vehicle):
+        """Test a repeated request renders from the fragment cache until data changes"""
+        url = reverse('vehicle-list-page')
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        assert len(queries) == 0
+
+        Vehicle.objects.create(vin="PAGE0000000000099", make="Kia", model="Rio", weight=1100)
+        assert b"PAGE0000000000099" in client.get(url).content
+
+
+@pytest.mark.django_db
+class TestRequestTiming:
+    """Tests for the per-request timing middleware"""
+
+    def test_server_timing_header(self, api_client, sample_vehicle):
+        """Test responses carry SQL, serialization and total timings"""
+        response = api_client.get(reverse('logistics:vehicle-list'))
+
+        timing = response['Server-Timing']
+        assert 'queries"' in timing
+        for metric in ('sql;dur=', 'serialize;dur=', 'render;dur=', 'app;dur=', 'total;dur='):
+            assert metric in timing
+
+    def test_lazy_loads_count_as_serialization(self, api_client, sample_vehicle, monkeypatch, caplog):
+        """Test queries run while the serializer builds its data are reported under serialize"""
+        import json
+        from logistics.models import Booking
+        monkeypatch.setattr('logistics.app_settings.SLOW_REQUEST_QUERIES', 1)
+        # Drop the prefetch so every booking loads its vehicles while serializing
+        monkeypatch.setattr('logistics.views.BookingViewSet.get_queryset',
+                            lambda self: Booking.objects.order_by('pk'))
+
+        with caplog.at_level('WARNING', logger='logistics.slow_requests'):
+            response = api_client.get(reverse('logistics:booking-list'), {'expand': 'vehicles'})
+
+        assert 'serialize;dur=' in response['Server-Timing']
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['serialize_queries'] == 1
+        assert record['serialize_ms'] >= 0
+
+    def test_slow_request_is_logged(self, api_client, sample_vehicle, monkeypatch, caplog):
+        """Test requests over the query threshold are logged with their viewset action"""
+        import json
+        monkeypatch.setattr('logistics.app_settings.SLOW_REQUEST_QUERIES', 1)
+
+        with caplog.at_level('WARNING', logger='logistics.slow_requests'):
+            api_client.get(reverse('logistics:booking-detail', args=[sample_vehicle.booking_id]))
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['view'] == 'logistics.views.BookingViewSet.retrieve'
+        assert record['status'] == 200
+        assert record['sql_queries'] >= 1
+
+    def test_streamed_export_is_measured_to_the_end(self, api_client, sample_vehicle, monkeypatch, caplog):
+        """Test the SQL run while an export streams is included in the slow request log"""
+        import json
+        monkeypatch.setattr('logistics.app_settings.SLOW_REQUEST_QUERIES', 1)
+
+        with caplog.at_level('WARNING', logger='logistics.slow_requests'):
+            response = api_client.get(reverse('logistics:vehicle-export-csv'))
+            assert not caplog.records
+            b''.join(response.streaming_content)
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['view'] == 'logistics.views.VehicleViewSet.export_csv'
+        assert record['sql_queries'] >= 1
+
+    def test_fast_request_is_not_logged(self, api_client, sample_booking, caplog):
+        """Test requests under both thresholds stay out of the slow request log"""
+        with caplog.at_level('WARNING', logger='logistics.slow_requests'):
+            api_client.get(reverse('logistics:booking-list'))
+        assert not caplog.records
+
+    def test_repeated_statements_are_grouped(self):
+        """Test an N+1 shows up as one statement with its count, IN lists collapsed"""
+        from logistics.middleware import QueryStats
+        stats = QueryStats()
+        execute = lambda sql, params, many, context: None
+        for _ in range(3):
+            stats(execute, 'SELECT * FROM vehicle WHERE booking_id = %s', [1], False, {})
+        stats(execute, 'SELECT * FROM booking WHERE id IN (%s, %s)', [1, 2], False, {})
+        stats(execute, 'SELECT * FROM booking WHERE id IN (%s)', [3], False, {})
+        stats(execute, 'SELECT 1', [], False, {})
+
+        top = stats.top_repeated(5)
+
+        assert stats.count == 6
+        assert [(item['sql'], item['count']) for item in top] == [
+            ('SELECT * FROM vehicle WHERE booking_id = %s', 3),
+            ('SELECT * FROM booking WHERE id IN (...)', 2),
+        ]
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Tests for the /metrics endpoint"""
+
+    def test_request_metrics_per_action(self, api_client, sample_vehicle):
+        """Test requests are counted and timed per viewset action"""
+        api_client.get(reverse('logistics:vehicle-list'))
+        api_client.get(reverse('logistics:vehicle-list'))
+
+        response = api_client.get(reverse('metrics'))
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        text = response.content.decode()
+        labels = 'method="GET",view="logistics.views.VehicleViewSet.list"'
+        assert ('logistics_requests_total{method="GET",status="200",'
+                'view="logistics.views.VehicleViewSet.list"} 2') in text
+        assert f'logistics_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+        assert f'logistics_request_duration_seconds_count{{{labels}}} 2' in text
+        assert 'logistics_response_cache_total{result="hit"} 1' in text
+        assert 'logistics_response_cache_total{result="miss"} 1' in text
+
+    def test_exported_rows_are_counted(self, api_client, sample_vehicle):
+        """Test streamed exports count their rows and latency once fully written"""
+        response = api_client.get(reverse('logistics:vehicle-export-csv'))
+        text = api_client.get(reverse('metrics')).content.decode()
+        assert 'VehicleViewSet.export_csv' not in text
+
+        b''.join(response.streaming_content)
+
+        text = api_client.get(reverse('metrics')).content.decode()
+        assert 'logistics_rows_exported_total{format="csv"} 1' in text
+        assert ('logistics_request_duration_seconds_count{method="GET",'
+                'view="logistics.views.VehicleViewSet.export_csv"} 1') in text
+
+    def test_reused_pid_keeps_the_old_file(self, metrics_registry):
+        """Test a new process with a dead process's pid writes a file of its own"""
+        from logistics.metrics import Registry
+        metrics_registry.inc('logistics_rows_purged_total', 40)
+        metrics_registry.flush()
+        successor = Registry(metrics_registry.directory)
+        successor.inc('logistics_rows_purged_total', 2)
+
+        counters, _ = successor.collect()
+
+        assert list(counters.values()) == [42]
+
+    def test_processes_are_added_up(self, api_client, metrics_registry):
+        """Test metrics written by other worker processes are included"""
+        import json
+        import os
+        from logistics.metrics import series_key
+        os.makedirs(metrics_registry.directory, exist_ok=True)
+        with open(os.path.join(metrics_registry.directory, '1.json'), 'w') as f:
+            json.dump({'counters': {series_key('logistics_rows_purged_total', {}): 40},
+                       'histograms': {}}, f)
+        metrics_registry.inc('logistics_rows_purged_total', 2)
+
+        text = api_client.get(reverse('metrics')).content.decode()
+        assert 'logistics_rows_purged_total 42' in text
+
+
+@pytest.fixture
+def staff_client(client, django_user_model):
+    """Return a test client logged in as a staff user"""
+    user = django_user_model.objects.create_user('staff', password='x', is_staff=True)
+    client.force_login(user)
+    return client
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    """Tests for on-demand request profiling"""
+
+    @pytest.fixture(autouse=True)
+    def profile_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('logistics.app_settings.PROFILE_DIR', str(tmp_path))
+        return tmp_path
+
+    def test_staff_request_is_profiled(self, staff_client, sample_vehicle, profile_dir):
+        """Test ?profile=1 saves pstats output and a summary for staff users"""
+        from logistics.profiling import list_profiles
+        response = staff_client.get(reverse('logistics:vehicle-list'), {'profile': 1})
+
+        profile_id = response['X-Profile']
+        assert (profile_dir / f'{profile_id}.prof').exists()
+        [meta] = list_profiles()
+        assert meta['id'] == profile_id
+        assert meta['view'] == 'logistics.views.VehicleViewSet.list'
+        assert meta['status'] == 200
+        assert meta['user'] == 'staff'
+
+    def test_streamed_export_is_profiled_to_the_end(self, staff_client, sample_vehicle, profile_dir):
+        """Test a streamed response is saved once its body has been sent"""
+        response = staff_client.get(reverse('logistics:vehicle-export-csv'), HTTP_X_PROFILE='1')
+        assert not list(profile_dir.iterdir())
+
+        b''.join(response.streaming_content)
+
+        assert (profile_dir / f"{response['X-Profile']}.prof").exists()
+
+    def test_other_users_are_not_profiled(self, client, sample_vehicle, profile_dir):
+        """Test anonymous users cannot trigger profiling"""
+        response = client.get(reverse('logistics:vehicle-list'), {'profile': 1})
+
+        assert 'X-Profile' not in response
+        assert not list(profile_dir.iterdir())
+
+    def test_false_values_do_not_profile(self, staff_client, profile_dir):
+        """Test ?profile=0 and X-Profile: 0 leave the request unprofiled"""
+        url = reverse('logistics:booking-list')
+
+        assert 'X-Profile' not in staff_client.get(url, {'profile': 0})
+        assert 'X-Profile' not in staff_client.get(url, HTTP_X_PROFILE='0')
+        assert not list(profile_dir.iterdir())
+
+    def test_rate_limit(self, staff_client, monkeypatch, profile_dir):
+        """Test profiling stops once the per-window limit is used up"""
+        monkeypatch.setattr('logistics.app_settings.PROFILE_RATE_LIMIT', 2)
+        url = reverse('logistics:booking-list')
+
+        headers = [staff_client.get(url, HTTP_X_PROFILE='1')['X-Profile'] for _ in range(3)]
+
+        assert headers[2] == 'rate-limited'
+        assert len(list(profile_dir.glob('*.prof'))) == 2
+
+    def test_old_profiles_are_rotated(self, staff_client, monkeypatch, profile_dir):
+        """Test only the newest PROFILE_KEEP profiles are kept"""
+        monkeypatch.setattr('logistics.app_settings.PROFILE_KEEP', 2)
+        url = reverse('logistics:booking-list')
+
+        ids = [staff_client.get(url, HTTP_X_PROFILE='1')['X-Profile'] for _ in range(3)]
+
+        assert sorted(path.stem for path in profile_dir.glob('*.prof')) == ids[1:]
+
+
+@pytest.mark.django_db
+class TestBookingBulkUpsert:
+    """Tests for the bulk booking upsert endpoint"""
+
+    def booking(self, number, days=0, **overrides):
+        departure = timezone.now().replace(microsecond=0) + timedelta(days=days)
+        return {
+            'booking_number': number, 'loading_port': 'Antwerp', 'discharge_port': 'Lagos',
+            'ship_departure_date': departure.isoformat(),
+            'ship_arrival_date': (departure + timedelta(days=20)).isoformat(),
+            **overrides,
+        }
+
+    def test_creates_updates_and_skips_unchanged(self, api_client):
+        """Test one request creates new bookings, updates changed ones and leaves the rest"""
+        url = reverse('logistics:booking-bulk-upsert')
+        same, changed = self.booking('BK-UP-1'), self.booking('BK-UP-2')
+        api_client.post(url, [same, changed], format='json')
+        updated_at = Booking.objects.get(booking_number='BK-UP-1').updated_at
+
+        response = api_client.post(url, [
+            same, {**changed, 'discharge_port': 'Santos'}, self.booking('BK-UP-3'),
+        ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data['created'], response.data['updated'], response.data['unchanged']) == (1, 1, 1)
+        assert [r['status'] for r in response.data['results']] == ['unchanged', 'updated', 'created']
+        assert Booking.objects.get(booking_number='BK-UP-2').discharge_port == 'Santos'
+        assert Booking.objects.get(booking_number='BK-UP-1').updated_at == updated_at
+        assert response.data['results'][2]['id'] == Booking.objects.get(booking_number='BK-UP-3').pk
+
+    def test_invalid_items_are_reported(self, api_client):
+        """Test bad dates, formats and in-batch duplicates fail per item"""
+        departure = timezone.now()
+        response = api_client.post(reverse('logistics:booking-bulk-upsert'), [
+            self.booking('BK-UP-OK'),
+            self.booking('BK-UP-OK'),
+            self.booking('BK UP BAD'),
+            self.booking('BK-UP-DATES', ship_arrival_date=(departure - timedelta(days=1)).isoformat()),
+        ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 1 and response.data['failed'] == 3
+        results = response.data['results']
+        assert 'Duplicate booking number in batch' in results[1]['errors']['booking_number']
+        assert 'booking_number' in results[2]['errors']
+        assert results[3]['errors']['non_field_errors'] == ['Ship departure date must be before arrival date']
+
+    def test_strict_writes_nothing_on_errors(self, api_client):
+        """Test ?strict=true rejects the whole batch if any item is invalid"""
+        response = api_client.post(reverse('logistics:booking-bulk-upsert') + '?strict=true', [
+            self.booking('BK-UP-STRICT'), {'booking_number': 'BK-UP-MISSING'},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+        assert not Booking.objects.filter(booking_number='BK-UP-STRICT').exists()
+
+    def test_queries_do_not_grow_with_the_batch(self, api_client):
+        """Test existing bookings are looked up with one query for the whole batch"""
+        url = reverse('logistics:booking-bulk-upsert')
+        api_client.post(url, [self.booking(f'BK-UP-Q{i}') for i in range(50)], format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, [
+                self.booking(f'BK-UP-Q{i}', days=1) for i in range(50)
+            ] + [self.booking(f'BK-UP-N{i}') for i in range(50)], format='json')
+
+        assert response.data['updated'] == 50 and response.data['created'] == 50
+        assert len(queries) <= 6
+
+    def test_concurrently_created_booking_is_updated(self, api_client, monkeypatch):
+        """Test a booking inserted after the lookup is updated instead of failing the batch"""
+        bulk_create = Booking.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            Booking.objects.create(**{**self.booking('BK-UP-RACE'), 'discharge_port': 'Dubai'})
+            return bulk_create(objs, **kwargs)
+
+        monkeypatch.setattr(Booking.objects, 'bulk_create', racing_bulk_create)
+        response = api_client.post(reverse('logistics:booking-bulk-upsert'), [self.booking('BK-UP-RACE')],
+                                   format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        booking = Booking.objects.get(booking_number='BK-UP-RACE')
+        assert booking.discharge_port == 'Lagos'
+        assert response.data['results'][0]['id'] == booking.pk
+
+    def test_rejects_non_list(self, api_client):
+        """Test the body must be a list of bookings"""
+        response = api_client.post(reverse('logistics:booking-bulk-upsert'), self.booking('BK-UP-X'), format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestVehicleUpsert:
+    """Tests for the idempotent vehicle upsert endpoint"""
+
+    def vehicle(self, vin, **overrides):
+        return {'vin': vin, 'make': 'Kia', 'model': 'EV6', 'weight': '1990.00',
+                'booking_number': 'BK-TEST-FIXTURE', **overrides}
+
+    def test_resending_is_idempotent(self, api_client, sample_booking):
+        """Test the same batch sent twice creates once and then changes nothing"""
+        url = reverse('logistics:vehicle-upsert')
+        batch = [self.vehicle('UPSERT00000000001'), self.vehicle('UPSERT00000000002', booking_number=None)]
+
+        first = api_client.post(url, batch, format='json')
+        updated_at = Vehicle.objects.get(vin='UPSERT00000000001').updated_at
+        second = api_client.post(url, batch, format='json')
+
+        assert first.data['created'] == 2
+        assert (second.data['created'], second.data['updated'], second.data['unchanged']) == (0, 0, 2)
+        assert Vehicle.objects.get(vin='UPSERT00000000001').updated_at == updated_at
+        assert second.data['results'][0]['id'] == Vehicle.objects.get(vin='UPSERT00000000001').pk
+        sample_booking.refresh_from_db()
+        assert sample_booking.vehicle_count == 1
+        assert float(sample_booking.total_weight) == 1990.0
+
+    def test_changed_vehicles_are_updated(self, api_client, sample_booking):
+        """Test existing VINs are updated in place and the booking totals follow"""
+        sample_vehicle = Vehicle.objects.create(
+            vin="UPSERT00000000009", make="Kia", model="EV6", weight=1990, booking=sample_booking
+        )
+        other = Booking.objects.create(
+            booking_number="BK-UPSERT-OTHER", loading_port="Emden", discharge_port="Santos",
+            ship_departure_date=timezone.now(), ship_arrival_date=timezone.now() + timedelta(days=9)
+        )
+        created_at = sample_vehicle.created_at
+
+        response = api_client.post(reverse('logistics:vehicle-upsert'), [
+            self.vehicle(sample_vehicle.vin, make='Tesla', model='Model 3', weight='1800.00',
+                         booking_number='BK-UPSERT-OTHER'),
+        ], format='json')
+
+        assert response.data['updated'] == 1
+        assert response.data['results'][0]['id'] == sample_vehicle.pk
+        vehicle = Vehicle.objects.get(pk=sample_vehicle.pk)
+        assert vehicle.booking_id == other.pk and vehicle.created_at == created_at
+        assert vehicle.updated_at > created_at
+        sample_vehicle.booking.refresh_from_db()
+        other.refresh_from_db()
+        assert (sample_vehicle.booking.vehicle_count, other.vehicle_count) == (0, 1)
+
+    def test_invalid_items_are_reported(self, api_client, sample_booking):
+        """Test bad VINs, unknown bookings and in-batch duplicates fail per item"""
+        response = api_client.post(reverse('logistics:vehicle-upsert'), [
+            self.vehicle('UPSERT00000000003'),
+            self.vehicle('UPSERT00000000003'),
+            self.vehicle('SHORT'),
+            self.vehicle('UPSERT00000000004', booking_number='BK-MISSING'),
+        ], format='json')
+
+        assert response.data['created'] == 1 and response.data['failed'] == 3
+        results = response.data['results']
+        assert 'Duplicate VIN in batch' in results[1]['errors']['vin']
+        assert 'vin' in results[2]['errors']
+        assert results[3]['errors']['booking_number'] == ['Booking BK-MISSING does not exist']
+
+    def test_strict_writes_nothing_on_errors(self, api_client, sample_booking):
+        """Test ?strict=true rejects the whole batch if any item is invalid"""
+        response = api_client.post(reverse('logistics:vehicle-upsert') + '?strict=true', [
+            self.vehicle('UPSERT00000000005'), self.vehicle('UPSERT00000000006', booking_number='BK-MISSING'),
+        ], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['results'][0]['status'] == 'skipped'
+        assert not Vehicle.objects.filter(vin='UPSERT00000000005').exists()
+
+    def test_existing_vins_are_read_inside_the_write_transaction(self, api_client, sample_booking):
+        """Test the VIN lookup the booking totals depend on runs in the same transaction as the write"""
+        with CaptureQueriesContext(connection) as queries:
+            api_client.post(reverse('logistics:vehicle-upsert'), [self.vehicle('UPSERT00000000007')], format='json')
+
+        statements = [query['sql'] for query in queries]
+        begin = next(i for i, sql in enumerate(statements) if sql.startswith('SAVEPOINT'))
+        lookup = next(i for i, sql in enumerate(statements) if 'FROM "logistics_vehicle"' in sql)
+        write = next(i for i, sql in enumerate(statements) if sql.startswith('INSERT INTO "logistics_vehicle"'))
+        assert begin < lookup < write
+
+    def test_queries_do_not_grow_with_the_batch(self, api_client, sample_booking):
+        """Test bookings and existing VINs are resolved with one query each"""
+        url = reverse('logistics:vehicle-upsert')
+        api_client.post(url, [self.vehicle(f'UPSERTK{i:010d}') for i in range(50)], format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, [
+                self.vehicle(f'UPSERTK{i:010d}', weight='2000.00') for i in range(50)
+            ] + [self.vehicle(f'UPSERTN{i:010d}') for i in range(50)], format='json')
+
+        assert response.data['updated'] == 50 and response.data['created'] == 50
+        assert len(queries) <= 8
@@ -0,0 +1,158 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import bump_version
+from .counters import CounterDeltas
+from .models import Booking, Vehicle
+from .serializers import BookingUpsertSerializer, VehicleUpsertSerializer
+
+BOOKING_UPSERT_FIELDS = ('loading_port', 'discharge_port', 'ship_arrival_date', 'ship_departure_date')
+VEHICLE_UPSERT_FIELDS = ('make', 'model', 'weight', 'booking_id')
+
+
+def result(index, key, status, **extra):
+    return {'index': index, **key, 'status': status, **extra}
+
+
+def validate_batch(serializer, items, key, label):
+    """
+    Run every item through the serializer and return a result list with
+    the errors filled in, and {key value: (index, data)} of the valid items.
+    Later items repeating a key are rejected as duplicates.
+    """
+    results = [None] * len(items)
+    valid = {}
+    for index, item in enumerate(items):
+        value = item.get(key) if isinstance(item, dict) else None
+        try:
+            data = serializer.run_validation(item)
+        except serializers.ValidationError as e:
+            results[index] = result(index, {key: value}, 'error', errors=e.detail)
+            continue
+        if data[key] in valid:
+            results[index] = result(index, {key: value}, 'error',
+                                    errors={key: [f'Duplicate {label} in batch']})
+            continue
+        valid[data[key]] = (index, data)
+    return results, valid
+
+
+def reject_batch(results, valid, key):
+    """Report the valid items of a rejected strict batch as skipped"""
+    for value, (index, _) in valid.items():
+        results[index] = result(index, {key: value}, 'skipped')
+    return results, False
+
+
+def upsert_bookings(items, strict=False):
+    """
+    Create or update bookings keyed by booking_number and return one result
+    per item: its index, booking number, status and id, or its errors.
+
+    The whole batch is validated before anything is written: every item
+    with the serializer's field and date checks, duplicate numbers within
+    the batch, and existing bookings with a single IN query. The changes
+    are then written as one INSERT ... ON CONFLICT (booking_number) DO
+    UPDATE, so a booking created concurrently is updated instead of
+    failing the batch.
+    Bookings that would not change are reported as `unchanged` and left
+    alone. Invalid items are skipped, or with strict=True nothing is
+    written and the valid items are reported as `skipped`; the second
+    return value says whether the batch was written.
+    """
+    results, valid = validate_batch(BookingUpsertSerializer(), items, 'booking_number', 'booking number')
+    if strict and len(valid) < len(items):
+        return reject_batch(results, valid, 'booking_number')
+
+    existing = Booking.objects.filter(booking_number__in=valid).only('booking_number', *BOOKING_UPSERT_FIELDS)
+    existing = {booking.booking_number: booking for booking in existing}
+
+    writes = []
+    for number, (index, data) in valid.items():
+        booking = existing.get(number)
+        if booking is not None and all(
+                getattr(booking, field) == data[field] for field in BOOKING_UPSERT_FIELDS):
+            results[index] = result(index, {'booking_number': number}, 'unchanged', id=booking.pk)
+            continue
+        status = 'created' if booking is None else 'updated'
+        writes.append((index, status, Booking(**data)))
+
+    # ON CONFLICT also covers a booking created by someone else since the lookup
+    with transaction.atomic():
+        Booking.objects.bulk_create(
+            [booking for _, _, booking in writes],
+            update_conflicts=True,
+            unique_fields=['booking_number'],
+            update_fields=[*BOOKING_UPSERT_FIELDS, 'updated_at'],
+        )
+        if writes:
+            bump_version('booking')
+
+    for index, status, booking in writes:
+        results[index] = result(index, {'booking_number': booking.booking_number}, status, id=booking.pk)
+    return results, True
+
+
+def upsert_vehicles(items, strict=False):
+    """
+    Create or update vehicles keyed by VIN and return one result per item,
+    like upsert_bookings.
+
+    Booking numbers are resolved with one query and the current state of
+    the VINs is read with another, inside the write transaction, so
+    vehicles that would not change are reported as `unchanged` and not
+    written at all, keeping their updated_at. The rest go out as one
+    INSERT ... ON CONFLICT (vin) DO UPDATE, and the booking totals are
+    adjusted for both new and moved vehicles.
+    """
+    results, valid = validate_batch(VehicleUpsertSerializer(), items, 'vin', 'VIN')
+
+    numbers = {data.get('booking_number') for _, data in valid.values()} - {None, ''}
+    bookings = dict(Booking.objects.filter(booking_number__in=numbers).values_list('booking_number', 'pk'))
+    for vin, (index, data) in list(valid.items()):
+        number = data.pop('booking_number', None)
+        if number and number not in bookings:
+            results[index] = result(index, {'vin': vin}, 'error',
+                                    errors={'booking_number': [f'Booking {number} does not exist']})
+            del valid[vin]
+            continue
+        data['booking_id'] = bookings.get(number)
+
+    if strict and len(valid) < len(items):
+        return reject_batch(results, valid, 'vin')
+
+    writes = []
+    deltas = CounterDeltas()
+    # Read the current state under the write transaction, with the rows
+    # locked where the database supports it, so a VIN moved or inserted by
+    # another request cannot slip between the lookup and the write and
+    # leave its old booking's totals behind
+    with transaction.atomic():
+        existing = Vehicle.objects.select_for_update().filter(vin__in=valid).only('vin', *VEHICLE_UPSERT_FIELDS)
+        existing = {vehicle.vin: vehicle for vehicle in existing}
+
+        for vin, (index, data) in valid.items():
+            vehicle = existing.get(vin)
+            if vehicle is not None:
+                if all(getattr(vehicle, field) == data[field] for field in VEHICLE_UPSERT_FIELDS):
+                    results[index] = result(index, {'vin': vin}, 'unchanged', id=vehicle.pk)
+                    continue
+                deltas.add(vehicle.booking_id, -1, -vehicle.weight)
+            deltas.add(data['booking_id'], 1, data['weight'])
+            status = 'created' if vehicle is None else 'updated'
+            writes.append((index, status, Vehicle(**data)))
+
+        Vehicle.objects.bulk_create(
+            [vehicle for _, _, vehicle in writes],
+            update_conflicts=True,
+            unique_fields=['vin'],
+            update_fields=[*VEHICLE_UPSERT_FIELDS, 'updated_at'],
+        )
+        # bulk_create skips signals, so update the booking totals here
+        deltas.apply()
+        if writes:
+            bump_version('booking', 'vehicle')
+
+    for index, status, vehicle in writes:
+        results[index] = result(index, {'vin': vehicle.vin}, status, id=vehicle.pk)
+    return results, True
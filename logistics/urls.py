@@ -7,7 +7,9 @@ app_name = 'logistics'  # Add namespace
 router = DefaultRouter()
 router.register(r'bookings', views.BookingViewSet)
 router.register(r'vehicles', views.VehicleViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 urlpatterns = [
+    path('cache-stats/', views.cache_stats, name='cache-stats'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,20 +1,132 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
+import zipfile
+from datetime import datetime, time, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Count, Max
 from django.http import HttpResponse
-from datetime import timedelta
-from .models import Booking, Vehicle
-from .serializers import BookingSerializer, VehicleSerializer
-from .resources import BookingResource, VehicleResource
-import csv
-import xlwt
-from io import BytesIO
+from django.urls import reverse
+from django.views.generic import TemplateView
+from .models import Booking, Vehicle, Job
+from .serializers import (
+    BookingSerializer, BookingListSerializer, VehicleSerializer, JobSerializer, get_field_params
+)
+from .exports import iter_rows, stream_csv, stream_xlsx
+from .importers import VehicleImporter, iter_upload_rows
+from .jobs import enqueue, enqueue_vehicle_import
+from .pagination import LogisticsPagination
+from .cache import CachedResponseMixin, get_stats
+from .metrics import exposition
+from .conditional import ConditionalGetMixin
+from .search import search_bookings, search_vehicles
+from .upserts import upsert_bookings, upsert_vehicles
+from .app_settings import (
+    OLD_VEHICLES_DAYS, IMPORT_BATCH_SIZE, IMPORT_MAX_BATCH_SIZE, BULK_ASSIGN_MAX_ITEMS,
+    IMPORT_BACKGROUND_THRESHOLD, CALENDAR_MAX_DAYS, RESPONSE_CACHE_ALIAS, RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TIMEOUT, BOOKING_UPSERT_MAX_ITEMS, VEHICLE_UPSERT_MAX_ITEMS
+)
+
+
+def only_requested_fields(queryset, request, always=('id', 'created_at')):
+    """
+    Load only the columns asked for with ?fields= / ?omit=. The primary key
+    and created_at are always loaded for ordering and pagination cursors.
+    """
+    fields, omit = get_field_params(request)
+    if fields is None and not omit:
+        return queryset
+
+    columns = {field.name for field in queryset.model._meta.concrete_fields}
+    selected = (columns if fields is None else fields & columns) - omit
+    return queryset.only(*(selected | set(always)))
+
+
+def parse_window_bound(value):
+    """Parse an ISO 8601 date or datetime query parameter into an aware datetime"""
+    parsed = parse_datetime(value or '')
+    if parsed is None:
+        day = parse_date(value or '')
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def job_accepted_response(request, job, message):
+    """Return a 202 response pointing at the status endpoint of a queued job"""
+    return Response(
+        {
+            'message': message,
+            'job_id': job.id,
+            'status_url': request.build_absolute_uri(reverse('logistics:job-detail', args=[job.id])),
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+def upsert_response(results, written, noun):
+    """Return the counts and per-item results of a bulk upsert, or a 400 if it was rejected"""
+    if not written:
+        failed = sum(result['status'] == 'error' for result in results)
+        return Response(
+            {'error': f'{failed} {noun} are invalid, nothing was written', 'results': results},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    for result in results:
+        counts['failed' if result['status'] == 'error' else result['status']] += 1
+    return Response({**counts, 'results': results}, status=status.HTTP_200_OK)
 
-class BookingViewSet(viewsets.ModelViewSet):
+
+class BookingViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
+    pagination_class = LogisticsPagination
+    cache_labels = ('booking',)
+    export_actions = ('export_csv', 'export_excel')
+
+    def expand_vehicles(self):
+        """
+        Nested vehicles are only embedded on detail or with ?expand=vehicles,
+        and never when ?fields= / ?omit= leave them out
+        """
+        fields, omit = get_field_params(self.request)
+        if 'vehicles' in omit or (fields is not None and 'vehicles' not in fields):
+            return False
+        if self.action != 'list':
+            return True
+        expand = self.request.query_params.get('expand', '')
+        return 'vehicles' in expand.split(',')
+
+    def get_serializer_class(self):
+        if self.expand_vehicles():
+            return BookingSerializer
+        return BookingListSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        term = self.request.query_params.get('search')
+        if term and self.action in ('list', *self.export_actions):
+            queryset = search_bookings(queryset, term)
+        if self.action in ('list', 'retrieve'):
+            queryset = only_requested_fields(queryset, self.request)
+        if self.action not in self.export_actions and self.expand_vehicles():
+            queryset = queryset.prefetch_related('vehicles')
+        return queryset
+
+    def get_validator_aggregates(self, detail):
+        aggregates = super().get_validator_aggregates(detail)
+        if self.expand_vehicles():
+            # Embedded vehicles can change without touching the booking row
+            aggregates['vehicles_last_modified'] = Max('vehicles__updated_at')
+            aggregates['vehicles_count'] = Count('vehicles', distinct=True)
+        return aggregates
 
     @action(detail=True, methods=['post'])
     def add_vehicle(self, request, pk=None):
@@ -41,85 +153,136 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    @action(detail=False, methods=['post'],
+        description="Create or update many bookings by booking number")
+    def bulk_upsert(self, request):
+        """
+        Create or update a list of bookings keyed by `booking_number`.
+
+        Returns the created, updated, unchanged and failed counts with a
+        result per item. Invalid items are skipped, unless ?strict=true, in
+        which case nothing is written and the response is a 400.
+        """
+        items = request.data
+        if not isinstance(items, list) or len(items) > BOOKING_UPSERT_MAX_ITEMS:
+            return Response(
+                {'error': f'Expected a list of at most {BOOKING_UPSERT_MAX_ITEMS} bookings'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        strict = request.query_params.get('strict', '').lower() in ('1', 'true', 'yes')
+        return upsert_response(*upsert_bookings(items, strict=strict), 'bookings')
+
     @action(detail=False, methods=['delete'])
     def delete_old_vehicles(self, request):
-        six_months_ago = timezone.now() - timedelta(days=180)
+        """
+        Queue a purge of vehicles with bookings older than OLD_VEHICLES_DAYS
+        """
+        job = enqueue(Job.KIND_PURGE_OLD_VEHICLES, days=OLD_VEHICLES_DAYS)
 
-        old_vehicles = Vehicle.objects.filter(
-            booking__ship_arrival_date__lt=six_months_ago
+        return job_accepted_response(
+            request, job,
+            f'Queued deletion of vehicles with bookings older than {OLD_VEHICLES_DAYS} days'
         )
 
-        count = old_vehicles.count()
-        old_vehicles.delete()
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Departure and arrival events between `start` and `end`.
 
-        return Response(
-            {'message': f'Deleted {count} vehicles with bookings older than 6 months'},
-            status=status.HTTP_200_OK
+        Returns one compact row per event, ordered by date, with the columns
+        listed in `fields`. Each event type is fetched with an indexed range
+        query, so the cost depends on the visible window only.
+        """
+        try:
+            start = parse_window_bound(request.query_params.get('start'))
+            end = parse_window_bound(request.query_params.get('end'))
+        except ValueError:
+            return Response(
+                {'error': 'start and end must be ISO 8601 dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start >= end or end - start > timedelta(days=CALENDAR_MAX_DAYS):
+            return Response(
+                {'error': f'end must be after start and at most {CALENDAR_MAX_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return self.cached_response(self.calendar_response, request, start, end)
+
+    def calendar_response(self, request, start, end):
+        columns = ('id', 'booking_number', 'vehicle_count')
+        departures = Booking.objects.filter(
+            ship_departure_date__gte=start, ship_departure_date__lt=end
+        ).order_by('ship_departure_date', 'id').values_list(
+            *columns, 'ship_departure_date', 'loading_port'
         )
+        arrivals = Booking.objects.filter(
+            ship_arrival_date__gte=start, ship_arrival_date__lt=end
+        ).order_by('ship_arrival_date', 'id').values_list(
+            *columns, 'ship_arrival_date', 'discharge_port'
+        )
+
+        events = [
+            [pk, number, event_type, date.isoformat(), port, count]
+            for event_type, rows in (('departure', departures), ('arrival', arrivals))
+            for pk, number, count, date, port in rows
+        ]
+        events.sort(key=lambda event: event[3])
+
+        return Response({
+            'fields': ['booking_id', 'booking_number', 'type', 'date', 'port', 'vehicle_count'],
+            'events': events,
+        })
 
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        resource = BookingResource()
-        dataset = resource.export()
-        response = HttpResponse(dataset.csv, content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="bookings.csv"'
-        return response
+        """
+        Stream bookings as CSV, honouring the list filters
+        """
+        fields = ('id', 'booking_number', 'loading_port', 'discharge_port',
+                  'ship_arrival_date', 'ship_departure_date')
+        queryset = self.filter_queryset(self.get_queryset())
+        return stream_csv(queryset, fields, fields, 'bookings.csv')
 
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """
-        Export bookings as Excel
+        Export bookings as Excel, honouring the list filters
         """
-        import io
-        import xlsxwriter
-
-        # Get all bookings
-        bookings = Booking.objects.all()
-
-        # Create a workbook and add a worksheet
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet('Bookings')
+        queryset = self.filter_queryset(self.get_queryset())
 
-        # Add headers
         headers = ['ID', 'Booking Number', 'Loading Port', 'Discharge Port',
                    'Departure Date', 'Arrival Date', 'Vehicle Count']
-
-        for col_num, header in enumerate(headers):
-            worksheet.write(0, col_num, header)
-
-        # Add data
-        for row_num, booking in enumerate(bookings, 1):
-            worksheet.write(row_num, 0, booking.id)
-            worksheet.write(row_num, 1, booking.booking_number)
-            worksheet.write(row_num, 2, booking.loading_port)
-            worksheet.write(row_num, 3, booking.discharge_port)
-            worksheet.write(row_num, 4, booking.ship_departure_date.strftime('%Y-%m-%d %H:%M'))
-            worksheet.write(row_num, 5, booking.ship_arrival_date.strftime('%Y-%m-%d %H:%M'))
-            worksheet.write(row_num, 6, booking.vehicles.count())
-
-        workbook.close()
-        output.seek(0)
-
-        # Create response
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        rows = (
+            (pk, number, loading_port, discharge_port,
+             departure.strftime('%Y-%m-%d %H:%M'), arrival.strftime('%Y-%m-%d %H:%M'), count)
+            for pk, number, loading_port, discharge_port, departure, arrival, count in iter_rows(
+                queryset,
+                ('id', 'booking_number', 'loading_port', 'discharge_port',
+                 'ship_departure_date', 'ship_arrival_date', 'vehicle_count')
+            )
         )
-        response['Content-Disposition'] = 'attachment; filename=bookings.xlsx'
+        return stream_xlsx(rows, headers, 'bookings.xlsx', 'Bookings')
 
-        return response
-
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
-    
+    pagination_class = LogisticsPagination
+    cache_labels = ('vehicle',)
+    export_actions = ('export_csv', 'export_excel')
+
     #get all vehicles with booking id
     def get_queryset(self):
         queryset = super().get_queryset()
         booking = self.request.query_params.get('booking', None)
         if booking is not None:
             queryset = queryset.filter(booking_id=booking)
+        term = self.request.query_params.get('search')
+        if term and self.action in ('list', *self.export_actions):
+            queryset = search_vehicles(queryset, term)
+        if self.action in ('list', 'retrieve'):
+            queryset = only_requested_fields(queryset, self.request)
         return queryset
 
     @action(detail=False, methods=['post'])
@@ -190,6 +353,55 @@ class VehicleViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser],
+        description="Import vehicles from an uploaded CSV or XLSX file")
+    def import_file(self, request):
+        """
+        Bulk import vehicles from a CSV or XLSX upload.
+
+        Expects a `file` with vin, make, model, weight and booking_number
+        columns. Valid rows are inserted in batches of `batch_size`; invalid
+        rows are skipped and listed in the report, unless `strict` is set,
+        in which case nothing is written when any row fails.
+
+        Uploads larger than IMPORT_BACKGROUND_THRESHOLD, or any upload with
+        `background` set, are queued as a job and answered with 202.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV or XLSX file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', IMPORT_BATCH_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid batch size'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        batch_size = max(1, min(batch_size, IMPORT_MAX_BATCH_SIZE))
+        strict = request.query_params.get('strict', '').lower() in ('1', 'true', 'yes')
+        background = request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+        if background or upload.size > IMPORT_BACKGROUND_THRESHOLD:
+            try:
+                job = enqueue_vehicle_import(upload, batch_size, strict=strict)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return job_accepted_response(request, job, f'Queued import of {upload.name}')
+
+        try:
+            rows = iter_upload_rows(upload)
+            report = VehicleImporter(batch_size=batch_size).run(rows, strict=strict)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if strict and report['failed']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def add_to_booking(self, request, pk=None):
         try:
@@ -220,53 +432,148 @@ class VehicleViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'],
+        description="Create or update many vehicles by VIN")
+    def upsert(self, request):
+        """
+        Create or update a list of vehicles keyed by `vin`, each with an
+        optional `booking_number`. Sending the same vehicles again is safe:
+        they are reported as unchanged and not written.
+
+        Returns the created, updated, unchanged and failed counts with a
+        result per item. Invalid items are skipped, unless ?strict=true, in
+        which case nothing is written and the response is a 400.
+        """
+        items = request.data
+        if not isinstance(items, list) or len(items) > VEHICLE_UPSERT_MAX_ITEMS:
+            return Response(
+                {'error': f'Expected a list of at most {VEHICLE_UPSERT_MAX_ITEMS} vehicles'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        strict = request.query_params.get('strict', '').lower() in ('1', 'true', 'yes')
+        return upsert_response(*upsert_vehicles(items, strict=strict), 'vehicles')
+
+    @action(detail=False, methods=['post'],
+        description="Associate, disassociate or move many vehicles at once")
+    def bulk_assign(self, request):
+        """
+        Move vehicles to the booking `booking_id` with a single UPDATE.
+
+        A `booking_id` of 0 disassociates them. Vehicles are selected with
+        `vehicle_ids`, `vins` or a `filter` such as {"booking": 3}.
+        """
+        try:
+            booking_id = int(request.data.get('booking_id', 0))
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'Invalid booking ID'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        vehicle_ids = request.data.get('vehicle_ids')
+        vins = request.data.get('vins')
+        filters = request.data.get('filter')
+
+        for items in (vehicle_ids, vins):
+            if items is not None and (not isinstance(items, list) or len(items) > BULK_ASSIGN_MAX_ITEMS):
+                return Response(
+                    {'error': f'Vehicle ids and VINs must be lists of at most {BULK_ASSIGN_MAX_ITEMS} items'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if filters is not None and not isinstance(filters, dict):
+            return Response(
+                {'error': 'Filter must be an object'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            if vehicle_ids is not None:
+                vehicle_ids = [int(pk) for pk in vehicle_ids]
+            updated, not_found = Vehicle.bulkAddToBooking(
+                booking_id, vehicle_ids=vehicle_ids, vins=vins, filters=filters
+            )
+        except (ValueError, TypeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {'updated': updated, 'not_found': not_found},
+            status=status.HTTP_200_OK
+        )
+
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        resource = VehicleResource()
-        dataset = resource.export()
-        response = HttpResponse(dataset.csv, content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="vehicles.csv"'
-        return response
+        """
+        Stream vehicles as CSV, honouring the list filters
+        """
+        fields = ('id', 'vin', 'make', 'model', 'weight', 'booking__booking_number')
+        headers = ('id', 'vin', 'make', 'model', 'weight', 'booking_number')
+        queryset = self.filter_queryset(self.get_queryset())
+        return stream_csv(queryset, fields, headers, 'vehicles.csv')
 
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """
-        Export vehicles as Excel
+        Export vehicles as Excel, honouring the list filters
         """
-        import io
-        import xlsxwriter
+        queryset = self.filter_queryset(self.get_queryset())
 
-        # Get all vehicles
-        vehicles = Vehicle.objects.all()
+        headers = ['ID', 'VIN', 'Make', 'Model', 'Weight', 'Booking']
+        rows = (
+            (pk, vin, make, model, float(weight), booking_number or 'Not assigned')
+            for pk, vin, make, model, weight, booking_number in iter_rows(
+                queryset,
+                ('id', 'vin', 'make', 'model', 'weight', 'booking__booking_number')
+            )
+        )
+        return stream_xlsx(rows, headers, 'vehicles.xlsx', 'Vehicles')
 
-        # Create a workbook and add a worksheet
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet('Vehicles')
 
-        # Add headers
-        headers = ['ID', 'VIN', 'Make', 'Model', 'Weight', 'Booking']
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of background jobs: progress, row counts, results and errors.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Hit and miss counters of the API response cache
+    """
+    return Response(get_stats())
+
+
+def metrics(request):
+    """
+    Request latencies, error and row counters of all worker processes, in
+    the Prometheus text format
+    """
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ListPageView(TemplateView):
+    """
+    Server-rendered list page. The template paginates and caches its table
+    with the logistics template tags; this only supplies the cache settings.
+    """
+    title = None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = self.title
+        context['cache_alias'] = RESPONSE_CACHE_ALIAS
+        # A zero timeout stores nothing, which disables the fragment cache
+        context['cache_timeout'] = RESPONSE_CACHE_TIMEOUT if RESPONSE_CACHE_ENABLED else 0
+        return context
+
+
+class BookingListPage(ListPageView):
+    template_name = 'logistics/booking_list.html'
+    title = 'Bookings'
 
-        for col_num, header in enumerate(headers):
-            worksheet.write(0, col_num, header)
-
-        # Add data
-        for row_num, vehicle in enumerate(vehicles, 1):
-            worksheet.write(row_num, 0, vehicle.id)
-            worksheet.write(row_num, 1, vehicle.vin)
-            worksheet.write(row_num, 2, vehicle.make)
-            worksheet.write(row_num, 3, vehicle.model)
-            worksheet.write(row_num, 4, float(vehicle.weight))
-            worksheet.write(row_num, 5, vehicle.booking.booking_number if vehicle.booking else 'Not assigned')
-
-        workbook.close()
-        output.seek(0)
-
-        # Create response
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=vehicles.xlsx'
 
-        return response
\ No newline at end of file
+class VehicleListPage(ListPageView):
+    template_name = 'logistics/vehicle_list.html'
+    title = 'Vehicles'
@@ -0,0 +1,54 @@
+import random
+
+# Characters allowed in a VIN (I, O and Q are never used)
+VIN_CHARS = '0123456789ABCDEFGHJKLMNPRSTUVWXYZ'
+
+# ISO 3779 transliteration of letters to the values used by the check digit
+TRANSLITERATION = dict(zip('0123456789', range(10)))
+TRANSLITERATION.update(zip('ABCDEFGH', range(1, 9)))
+TRANSLITERATION.update(zip('JKLMN', range(1, 6)))
+TRANSLITERATION.update({'P': 7, 'R': 9})
+TRANSLITERATION.update(zip('STUVWXYZ', range(2, 10)))
+
+POSITION_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Weighted value of every character at every position, so a VIN's checksum
+# is 17 table lookups
+WEIGHTED_VALUES = [
+    {char: TRANSLITERATION[char] * weight for char in VIN_CHARS}
+    for weight in POSITION_WEIGHTS
+]
+
+CHECK_DIGIT_INDEX = 8
+
+
+def vin_check_digit(vin):
+    """Return the North American check digit (position 9) of a VIN"""
+    remainder = sum(WEIGHTED_VALUES[i][char] for i, char in enumerate(vin)) % 11
+    return 'X' if remainder == 10 else str(remainder)
+
+
+def is_valid_vin(vin):
+    """Whether a VIN is 17 allowed characters and carries the right check digit"""
+    return (
+        len(vin) == 17
+        and all(char in TRANSLITERATION for char in vin)
+        and vin[CHECK_DIGIT_INDEX] == vin_check_digit(vin)
+    )
+
+
+def generate_vins(count, rng=random, prefixes=('',)):
+    """
+    Return `count` random VINs with valid check digits.
+
+    All random characters of the batch are drawn with a single call, and
+    each VIN starts with one of `prefixes` (e.g. manufacturer codes).
+    """
+    prefixes = rng.choices(prefixes, k=count) if len(prefixes) > 1 else list(prefixes) * count
+    chars = rng.choices(VIN_CHARS, k=count * 17)
+    vins = []
+    for i, prefix in enumerate(prefixes):
+        body = prefix + ''.join(chars[i * 17 + len(prefix):(i + 1) * 17])
+        # The check digit position has weight 0, so any placeholder works
+        vins.append(body[:CHECK_DIGIT_INDEX] + vin_check_digit(body) + body[CHECK_DIGIT_INDEX + 1:])
+    return vins
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from corsheaders.defaults import default_headers
 from decouple import config
 
 
@@ -47,7 +48,6 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'corsheaders',
-    'debug_toolbar',
     'import_export',
     'drf_yasg',
 
@@ -59,16 +59,23 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'logistics.middleware.RequestTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'logistics.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',  # Add this
 ]
 
+# The debug toolbar records every query with its stack trace, which is far
+# too slow outside development; RequestTimingMiddleware covers production
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 LOGISTICS_SETTINGS = {
     'OLD_VEHICLES_DAYS': 180,  # Days to consider vehicles "old" (6 months)
     'MAX_VEHICLES_PER_BOOKING': 100,  # Limit vehicles per booking
@@ -81,12 +88,26 @@ INTERNAL_IPS = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True  # For development only!
+# Let the frontend revalidate cached API responses
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since', 'x-profile')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'Server-Timing', 'X-Profile']
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# The logistics API response cache lives here. Local memory is per process,
+# so use the file based backend when running several worker processes:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+# 'LOCATION': '/tmp/logistics-cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'logistics',
+    }
+}
+
 DEBUG_TOOLBAR_CONFIG = {
     'DISABLE_PANELS': {
         'debug_toolbar.panels.profiling.ProfilingPanel',
@@ -22,6 +22,7 @@ from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from logistics.views import BookingListPage, VehicleListPage, metrics
 
 
 # Swagger and Redoc documentation
@@ -43,6 +44,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('logistics.urls')),  # API endpoints
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
+    path('bookings/', BookingListPage.as_view(), name='booking-list-page'),
+    path('vehicles/', VehicleListPage.as_view(), name='vehicle-list-page'),
+    path('metrics', metrics, name='metrics'),
     #path('api/logistics/', include('logistics.urls', namespace='logistics')),
     
     # Swagger documentation URLs
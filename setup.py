@@ -10,7 +10,11 @@ setup(
         "djangorestframework>=3.12.0",
         "django-import-export>=2.5.0",
         "xlwt>=1.3.0",
+        "xlsxwriter>=1.2.0",
     ],
+    extras_require={
+        "xlsx-import": ["openpyxl>=3.0"],
+    },
     author="Sinan Öndül",
     author_email="sinanondul@gmail.com",
     description="A Django app for managing vehicle logistics including bookings and vehicles",